@@ -17,12 +17,15 @@ db = SQLAlchemy()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 oauth = OAuth()
-limiter = Limiter(key_func=get_remote_address, storage_uri="memory://")
+# Storage is configured per app in create_app (see app.ratelimit)
+limiter = Limiter(key_func=get_remote_address)
 
 
-def create_app():
-    app = Flask(__name__)
+def create_app(config=None, instance_path=None):
+    app = Flask(__name__, instance_path=instance_path)
     app.config.from_object("app.config.Config")
+    if config:
+        app.config.update(config)
 
     # Reject known-weak secret keys
     if app.config["SECRET_KEY"] in _WEAK_KEYS:
@@ -36,6 +39,15 @@ def create_app():
     # Trust proxy headers (Cloudflare tunnel sets X-Forwarded-Proto etc.)
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
+    # Importing app.ratelimit registers the sqlitewal:// storage scheme
+    from app import ratelimit  # noqa: F401
+
+    if not app.config.get("RATELIMIT_STORAGE_URI"):
+        app.config["RATELIMIT_STORAGE_URI"] = (
+            f"sqlitewal://{os.path.join(app.instance_path, 'ratelimit.db')}"
+            f"?sync_interval={app.config['RATELIMIT_SYNC_INTERVAL']}"
+        )
+
     db.init_app(app)
     csrf.init_app(app)
     limiter.init_app(app)
@@ -49,10 +61,21 @@ def create_app():
     from app.auth.routes import auth_bp
     from app.catalog.routes import catalog_bp
     from app.admin.routes import admin_bp
+    from app.metrics.routes import metrics_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(catalog_bp)
     app.register_blueprint(admin_bp, url_prefix="/admin")
+    # METRICS_ENABLED=0 removes the endpoint, not just the samples behind it
+    if app.config["METRICS_ENABLED"]:
+        app.register_blueprint(metrics_bp)
+
+    # Request/SQL metrics for /metrics, and opt-in profiling (no-op unless PROFILING is set)
+    from app import profiling
+    from app.metrics import instrumentation
+
+    instrumentation.init_app(app)
+    profiling.init_app(app)
 
     # Security headers
     @app.after_request
@@ -77,14 +100,25 @@ def create_app():
     # Create tables on first request
     with app.app_context():
         from app import models  # noqa: F401
+        from app.migrations import upgrade_schema
 
         db.create_all()
+        created = upgrade_schema(db)
+        if created:
+            app.logger.info(f"Created missing indexes: {', '.join(created)}")
+
+        from app.catalog import logos, snapshot
+        from app.catalog.search import warm_indexes
+
+        snapshot.init_app(app)
+        logos.init_app(app)
+        warm_indexes()
 
     return app
 
 
 def _configure_logging(app):
-    log_dir = os.path.join(app.root_path, "..", "logs")
+    log_dir = app.config["LOG_DIR"] or os.path.join(app.root_path, "..", "logs")
     os.makedirs(log_dir, exist_ok=True)
 
     file_handler = RotatingFileHandler(
@@ -5,51 +5,68 @@ from datetime import datetime, timezone
 from functools import wraps
 from urllib.parse import urlparse
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response, current_app, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import undefer
 
-from app import db
+from app import db, limiter
+from app.catalog.logos import queue_logos
+from app.catalog.routes import _user_or_ip
+from app.catalog.snapshot import schedule_rebuild
 from app.models import AuditLog, Software, Category
 
 admin_bp = Blueprint("admin", __name__)
 
 _BLOCKED_HOSTNAMES = {"localhost", "metadata.google.internal"}
 _MAX_CATEGORY_NAME = 200
+_MAX_CATEGORIES_PER_PAGE = 100
 
 
-def _is_safe_url(url):
-    """Return True if url uses http/https and does not point to internal networks."""
-    if not url:
-        return True
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme.lower() not in ("http", "https"):
-            return False
+def _is_internal(addr):
+    return addr.is_private or addr.is_loopback or addr.is_link_local or addr.is_reserved
+
 
-        hostname = parsed.hostname
-        if not hostname:
-            return False
+def public_addresses(url):
+    """Resolve the host of an http(s) url once; returns its addresses if all are public.
 
-        if hostname in _BLOCKED_HOSTNAMES:
-            return False
+    Returns an empty list for other schemes, blocked or unresolvable hosts,
+    and hosts with any internal address. Callers that then connect must use
+    these addresses rather than resolving the name again, or DNS could point
+    it at an internal host in between (see app.catalog.logos).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in ("http", "https"):
+        return []
 
-        # Check for IP addresses pointing to private/reserved ranges
+    hostname = parsed.hostname
+    if not hostname or hostname in _BLOCKED_HOSTNAMES:
+        return []
+
+    try:
+        # IP literals are checked as they are
+        addresses = [ipaddress.ip_address(hostname)]
+    except ValueError:
         try:
-            addr = ipaddress.ip_address(hostname)
-            if addr.is_private or addr.is_loopback or addr.is_link_local or addr.is_reserved:
-                return False
-        except ValueError:
-            # Not an IP literal — resolve the hostname and check
-            try:
-                resolved = socket.getaddrinfo(hostname, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
-                for _, _, _, _, sockaddr in resolved:
-                    addr = ipaddress.ip_address(sockaddr[0])
-                    if addr.is_private or addr.is_loopback or addr.is_link_local or addr.is_reserved:
-                        return False
-            except socket.gaierror:
-                pass  # DNS failure is fine — URL just won't load
+            resolved = socket.getaddrinfo(hostname, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            # A host that doesn't resolve is not known to be public
+            return []
+        addresses = [ipaddress.ip_address(sockaddr[0]) for _, _, _, _, sockaddr in resolved]
+
+    if not addresses or any(_is_internal(addr) for addr in addresses):
+        return []
+    return [str(addr) for addr in dict.fromkeys(addresses)]
+
+
+def is_public_url(url):
+    """Return True if url uses http/https and does not point to internal networks.
 
+    Used before the server itself fetches a URL (see app.catalog.logos).
+    """
+    if not url:
         return True
+    try:
+        return bool(public_addresses(url))
     except Exception:
         return False
 
@@ -65,6 +82,59 @@ def _is_safe_url(url):
         return False
 
 
+def _validate_software_fields(software):
+    """Return an error message if a software entry's fields are invalid, else None."""
+    if not software.name:
+        return "Name is required."
+    limits = {"Name": (software.name, 200), "URL": (software.url, 500),
+              "Tagline": (software.tagline, 500), "Logo URL": (software.logo, 500)}
+    for label, (value, limit) in limits.items():
+        if value and len(value) > limit:
+            return f"{label} must be {limit} characters or less."
+    return None
+
+
+def _catalog_changed():
+    """Refresh everything derived from the catalog after an admin write."""
+    schedule_rebuild()
+    queue_logos()
+
+
+def _apply_categories(software):
+    """Set the categories submitted with the edit form; returns an error message or None.
+
+    The form sends the ids of the picked categories plus a comma-separated
+    list of new names. Ids and names are each resolved with one query.
+    """
+    selected_ids = request.form.getlist("categories", type=int)
+    categories = Category.query.filter(Category.id.in_(selected_ids)).all() if selected_ids else []
+
+    names = []
+    for cat_name in request.form.get("new_categories", "").split(","):
+        cat_name = cat_name.strip()
+        if not cat_name:
+            continue
+        if len(cat_name) > _MAX_CATEGORY_NAME:
+            # Keep the picked categories on the re-rendered form
+            software.categories = categories
+            return f"Category name must be {_MAX_CATEGORY_NAME} characters or less."
+        if cat_name not in names:
+            names.append(cat_name)
+
+    if names:
+        existing = {c.name: c for c in Category.query.filter(Category.name.in_(names))}
+        for cat_name in names:
+            cat = existing.get(cat_name)
+            if cat is None:
+                cat = Category(name=cat_name, category_type=Category.classify(cat_name))
+                db.session.add(cat)
+            if cat not in categories:
+                categories.append(cat)
+
+    software.categories = categories
+    return None
+
+
 def admin_required(f):
     @wraps(f)
     @login_required
@@ -85,8 +155,6 @@ def dashboard():
 @admin_bp.route("/add", methods=["GET", "POST"])
 @admin_required
 def add():
-    categories = Category.query.order_by(Category.category_type, Category.name).all()
-
     if request.method == "POST":
         software = Software(
             name=request.form.get("name", "").strip(),
@@ -100,38 +168,20 @@ def add():
         err = _validate_software_fields(software)
         if err:
             flash(err, "error")
-            return render_template("admin/edit.html", software=software, categories=categories, is_new=True)
+            return render_template("admin/edit.html", software=software, is_new=True)
 
         if not _is_safe_url(software.url):
             flash("URL must use http:// or https://.", "error")
-            return render_template("admin/edit.html", software=software, categories=categories, is_new=True)
+            return render_template("admin/edit.html", software=software, is_new=True)
 
         if not _is_safe_url(software.logo):
             flash("Logo URL must use http:// or https://.", "error")
-            return render_template("admin/edit.html", software=software, categories=categories, is_new=True)
-
-        # Handle categories
-        selected_ids = request.form.getlist("categories", type=int)
-        software.categories = Category.query.filter(Category.id.in_(selected_ids)).all()
-
-        # Handle new categories
-        new_cats = request.form.get("new_categories", "").strip()
-        if new_cats:
-            for cat_name in new_cats.split(","):
-                cat_name = cat_name.strip()
-                if not cat_name:
-                    continue
-                if len(cat_name) > _MAX_CATEGORY_NAME:
-                    flash(f"Category name must be {_MAX_CATEGORY_NAME} characters or less.", "error")
-                    return render_template("admin/edit.html", software=software, categories=categories, is_new=True)
-                existing = Category.query.filter_by(name=cat_name).first()
-                if existing:
-                    if existing not in software.categories:
-                        software.categories.append(existing)
-                else:
-                    cat = Category(name=cat_name, category_type=Category.classify(cat_name))
-                    db.session.add(cat)
-                    software.categories.append(cat)
+            return render_template("admin/edit.html", software=software, is_new=True)
+
+        err = _apply_categories(software)
+        if err:
+            flash(err, "error")
+            return render_template("admin/edit.html", software=software, is_new=True)
 
         db.session.add(software)
         db.session.flush()
@@ -141,19 +191,18 @@ def add():
             details=software.name,
         ))
         db.session.commit()
+        _catalog_changed()
         current_app.logger.info(f'Admin {current_user.email} added software "{software.name}"')
         flash(f'"{software.name}" has been added.', "success")
         return redirect(url_for("admin.dashboard"))
 
-    return render_template("admin/edit.html", software=None, categories=categories, is_new=True)
+    return render_template("admin/edit.html", software=None, is_new=True)
 
 
 @admin_bp.route("/edit/<int:software_id>", methods=["GET", "POST"])
 @admin_required
 def edit(software_id):
-    software = db.get_or_404(Software, software_id)
-    categories = Category.query.order_by(Category.category_type, Category.name).all()
-
+    software = db.get_or_404(Software, software_id, options=[undefer(Software.content)])
     if request.method == "POST":
         software.name = request.form.get("name", "").strip()
         software.url = request.form.get("url", "").strip()
@@ -165,37 +214,20 @@ def edit(software_id):
         err = _validate_software_fields(software)
         if err:
             flash(err, "error")
-            return render_template("admin/edit.html", software=software, categories=categories, is_new=False)
+            return render_template("admin/edit.html", software=software, is_new=False)
 
         if not _is_safe_url(software.url):
             flash("URL must use http:// or https://.", "error")
-            return render_template("admin/edit.html", software=software, categories=categories, is_new=False)
+            return render_template("admin/edit.html", software=software, is_new=False)
 
         if not _is_safe_url(software.logo):
             flash("Logo URL must use http:// or https://.", "error")
-            return render_template("admin/edit.html", software=software, categories=categories, is_new=False)
-
-        selected_ids = request.form.getlist("categories", type=int)
-        software.categories = Category.query.filter(Category.id.in_(selected_ids)).all()
-
-        # Handle new categories
-        new_cats = request.form.get("new_categories", "").strip()
-        if new_cats:
-            for cat_name in new_cats.split(","):
-                cat_name = cat_name.strip()
-                if not cat_name:
-                    continue
-                if len(cat_name) > _MAX_CATEGORY_NAME:
-                    flash(f"Category name must be {_MAX_CATEGORY_NAME} characters or less.", "error")
-                    return render_template("admin/edit.html", software=software, categories=categories, is_new=False)
-                existing = Category.query.filter_by(name=cat_name).first()
-                if existing:
-                    if existing not in software.categories:
-                        software.categories.append(existing)
-                else:
-                    cat = Category(name=cat_name, category_type=Category.classify(cat_name))
-                    db.session.add(cat)
-                    software.categories.append(cat)
+            return render_template("admin/edit.html", software=software, is_new=False)
+
+        err = _apply_categories(software)
+        if err:
+            flash(err, "error")
+            return render_template("admin/edit.html", software=software, is_new=False)
 
         db.session.add(AuditLog(
             user_id=current_user.id, action="edit",
@@ -203,11 +235,40 @@ def edit(software_id):
             details=software.name,
         ))
         db.session.commit()
+        _catalog_changed()
         current_app.logger.info(f'Admin {current_user.email} edited software "{software.name}"')
         flash(f'"{software.name}" has been updated.', "success")
         return redirect(url_for("admin.dashboard"))
 
-    return render_template("admin/edit.html", software=software, categories=categories, is_new=False)
+    return render_template("admin/edit.html", software=software, is_new=False)
+
+
+@admin_bp.route("/categories")
+@admin_required
+# Called per keystroke like /api/suggest, so it shares that limit
+@limiter.limit(lambda: current_app.config["SUGGEST_RATE_LIMIT"], key_func=_user_or_ip)
+def category_search():
+    """Paginated category lookup by name prefix, for the edit form's picker."""
+    prefix = request.args.get("q", "").strip()
+    page = max(1, request.args.get("page", 1, type=int))
+    per_page = max(1, min(request.args.get("per_page", 20, type=int), _MAX_CATEGORIES_PER_PAGE))
+
+    query = Category.query
+    if prefix:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(Category.name.ilike(f"{escaped}%", escape="\\"))
+    # One extra row tells whether there is another page
+    rows = (
+        query.order_by(Category.name)
+        .offset((page - 1) * per_page)
+        .limit(per_page + 1)
+        .all()
+    )
+    return jsonify({
+        "items": [{"id": c.id, "name": c.name, "type": c.category_type} for c in rows[:per_page]],
+        "page": page,
+        "has_more": len(rows) > per_page,
+    })
 
 
 @admin_bp.route("/delete/<int:software_id>", methods=["POST"])
@@ -222,6 +283,7 @@ def delete(software_id):
     ))
     db.session.delete(software)
     db.session.commit()
+    _catalog_changed()
     current_app.logger.info(f'Admin {current_user.email} deleted software "{name}"')
     flash(f'"{name}" has been deleted.', "success")
     return redirect(url_for("admin.dashboard"))
@@ -231,7 +293,9 @@ def delete(software_id):
 @admin_required
 def export_backup():
     """Export all software entries as a JSON backup file."""
-    software_list = Software.query.order_by(Software.name).all()
+    software_list = (
+        Software.query.options(undefer(Software.content)).order_by(Software.name).all()
+    )
     data = []
     for s in software_list:
         data.append({
@@ -284,7 +348,7 @@ def import_backup():
         db.session.flush()
 
     category_cache = {c.name: c for c in Category.query.all()}
-    existing_names = {s.name for s in Software.query.all()} if mode == "merge" else set()
+    existing_names = set(db.session.scalars(db.select(Software.name))) if mode == "merge" else set()
     added = 0
     skipped = 0
 
@@ -336,6 +400,7 @@ def import_backup():
         resource_type="software", details=f"mode={mode}, added={added}, skipped={skipped}",
     ))
     db.session.commit()
+    _catalog_changed()
     current_app.logger.info(
         f'Admin {current_user.email} imported backup: mode={mode}, added={added}, skipped={skipped}'
     )
@@ -0,0 +1,279 @@
+"""Local mirror of external software logos.
+
+``Software.logo`` holds arbitrary vendor URLs. Each distinct URL gets a
+CachedLogo row and is downloaded once by a background thread, which stores
+the original and a size-capped WebP thumbnail under ``instance/logos/``,
+both named by the sha256 of their contents. Once a logo is ready the catalog
+snapshot is rebuilt, so the grid and detail pages point at
+``/logos/<sha256>.webp`` (served with immutable cache headers) instead of
+the vendor's CDN. Logos that are not cached (yet) keep their original URL.
+
+Rows are claimed with a conditional UPDATE, so several gunicorn workers can
+run the thread without fetching the same URL twice. Failed downloads are
+not retried until ``flask fetch-logos --retry-failed``.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urljoin, urlparse
+
+import click
+import requests
+from flask import current_app
+from flask.cli import with_appcontext
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.catalog.publish import write_atomic
+from app.catalog.snapshot import rebuild_snapshot
+from app.models import CachedLogo, Software
+
+LOGO_DIR = "logos"
+_MAX_REDIRECTS = 3
+_MAX_PIXELS = 25_000_000
+# A "fetching" claim older than this belongs to a worker that died mid-download
+_STALE_CLAIM = timedelta(minutes=10)
+
+
+class LogoError(Exception):
+    """A logo could not be downloaded or decoded."""
+
+
+def logo_dir():
+    return os.path.join(current_app.instance_path, LOGO_DIR)
+
+
+def queue_logos():
+    """Add rows for logo URLs that have never been fetched and wake the worker."""
+    if current_app.config["LOGO_CACHE_ENABLED"] and _queue_missing():
+        current_app.extensions["logo_worker"].wake()
+
+
+def _queue_missing():
+    """Insert pending rows for new logo URLs; returns True if any logo is pending."""
+    known = db.select(CachedLogo.id).where(CachedLogo.url == Software.logo)
+    urls = db.session.scalars(
+        db.select(Software.logo).distinct()
+        .where(Software.logo != "", ~known.exists())
+    ).all()
+    if urls:
+        try:
+            db.session.execute(db.insert(CachedLogo), [{"url": url} for url in urls])
+            db.session.commit()
+        except IntegrityError:
+            # Another worker queued the same URLs first
+            db.session.rollback()
+
+    pending = db.session.scalar(
+        db.select(CachedLogo.id).where(CachedLogo.status == "pending").limit(1)
+    )
+    return pending is not None
+
+
+def fetch_pending():
+    """Download every pending logo; returns ``(ready, failed)`` counts."""
+    ready = failed = 0
+    while (logo := _claim_next()) is not None:
+        try:
+            logo.original, logo.thumbnail = _store(_download(logo.url))
+            logo.status = "ready"
+            logo.error = ""
+            ready += 1
+        except (LogoError, requests.RequestException, OSError) as e:
+            logo.status = "failed"
+            logo.error = str(e)[:200]
+            failed += 1
+            current_app.logger.info(f"Could not cache logo {logo.url}: {logo.error}")
+        db.session.commit()
+
+    if ready:
+        rebuild_snapshot()
+    return ready, failed
+
+
+def _claim_next():
+    stale = datetime.now(timezone.utc) - _STALE_CLAIM
+    claimable = db.or_(
+        CachedLogo.status == "pending",
+        db.and_(CachedLogo.status == "fetching", CachedLogo.updated_at < stale),
+    )
+    while True:
+        logo = CachedLogo.query.filter(claimable).order_by(CachedLogo.id).first()
+        if logo is None:
+            return None
+        claimed = db.session.execute(
+            db.update(CachedLogo)
+            .where(CachedLogo.id == logo.id, claimable)
+            .values(status="fetching", updated_at=datetime.now(timezone.utc))
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            db.session.refresh(logo)
+            return logo
+
+
+class _PinnedAdapter(HTTPAdapter):
+    """Transport that connects to one pre-checked address instead of resolving the URL's host.
+
+    The Host header, TLS SNI and certificate check still use the hostname
+    from the URL, so virtual hosts and HTTPS work as usual.
+    """
+
+    def __init__(self, address):
+        self._address = address
+        super().__init__()
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        hostname = host_params["host"]
+        host_params["host"] = self._address
+        if host_params["scheme"] == "https":
+            pool_kwargs["server_hostname"] = hostname
+            pool_kwargs["assert_hostname"] = hostname
+        return host_params, pool_kwargs
+
+    def send(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        host = f"[{parsed.hostname}]" if ":" in parsed.hostname else parsed.hostname
+        request.headers["Host"] = f"{host}:{parsed.port}" if parsed.port else host
+        return super().send(request, **kwargs)
+
+
+def _download(url):
+    """GET ``url``, re-checking the target of every redirect before following it.
+
+    Each hop resolves its host once, rejects it unless every address is
+    public, and connects to that checked address, so the name can't be
+    re-pointed at an internal host between the check and the request.
+    """
+    # admin.routes imports this module for queue_logos
+    from app.admin.routes import public_addresses
+
+    max_bytes = current_app.config["LOGO_MAX_BYTES"]
+    for _ in range(_MAX_REDIRECTS + 1):
+        addresses = public_addresses(url)
+        if not addresses:
+            raise LogoError("URL is not a public http(s) address")
+        with requests.Session() as session:
+            # Environment proxies would resolve the name themselves
+            session.trust_env = False
+            adapter = _PinnedAdapter(addresses[0])
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            with session.get(
+                url,
+                stream=True,
+                allow_redirects=False,
+                timeout=current_app.config["LOGO_FETCH_TIMEOUT"],
+            ) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["Location"])
+                    continue
+                response.raise_for_status()
+                data = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    data += chunk
+                    if len(data) > max_bytes:
+                        raise LogoError(f"larger than {max_bytes} bytes")
+                return bytes(data)
+    raise LogoError("too many redirects")
+
+
+def _store(data):
+    """Write the original and its thumbnail; returns both sha256 digests."""
+    thumbnail = _thumbnail(data, current_app.config["LOGO_THUMBNAIL_SIZE"])
+    original_digest = hashlib.sha256(data).hexdigest()
+    thumbnail_digest = hashlib.sha256(thumbnail).hexdigest()
+
+    originals = os.path.join(logo_dir(), "originals")
+    os.makedirs(originals, exist_ok=True)
+    # Content-addressed: an existing file already has these exact bytes
+    for path, content in (
+        (os.path.join(originals, original_digest), data),
+        (os.path.join(logo_dir(), f"{thumbnail_digest}.webp"), thumbnail),
+    ):
+        if not os.path.exists(path):
+            write_atomic(path, content)
+    return original_digest, thumbnail_digest
+
+
+def _thumbnail(data, size):
+    """Re-encode an image as WebP no larger than ``size`` x ``size``."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > _MAX_PIXELS:
+                raise LogoError(f"image is {image.width}x{image.height}")
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            out = io.BytesIO()
+            image.save(out, "WEBP", quality=85)
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise LogoError(f"not a supported image: {e}") from e
+
+
+class LogoWorker:
+    """Background thread that drains the pending queue whenever it is woken."""
+
+    def __init__(self, app):
+        self._app = app
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.startup_pending = False
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="logo-cache", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    fetch_pending()
+                except Exception:
+                    self._app.logger.exception("Logo cache worker failed")
+                finally:
+                    db.session.remove()
+
+
+def init_app(app):
+    worker = app.extensions["logo_worker"] = LogoWorker(app)
+    app.cli.add_command(fetch_logos)
+    if not app.config["LOGO_CACHE_ENABLED"] or not _queue_missing():
+        return
+
+    # Start on the first request, so one-off CLI commands never spawn the thread
+    worker.startup_pending = True
+
+    @app.before_request
+    def _start_logo_worker():
+        if worker.startup_pending:
+            worker.startup_pending = False
+            worker.wake()
+
+
+@click.command("fetch-logos")
+@click.option("--retry-failed", is_flag=True, help="Also retry logos that failed before.")
+@with_appcontext
+def fetch_logos(retry_failed):
+    """Download uncached logos now, in the foreground."""
+    if retry_failed:
+        db.session.execute(
+            db.update(CachedLogo).where(CachedLogo.status == "failed").values(status="pending")
+        )
+        db.session.commit()
+    _queue_missing()
+    ready, failed = fetch_pending()
+    click.echo(f"Cached {ready} logos ({failed} failed).")
@@ -0,0 +1,100 @@
+"""Static catalog files published alongside each snapshot.
+
+Each snapshot version gets an immutable ``software-<version>.json`` (plus a
+gzip copy) holding the full /api/software payload, which api_software hands
+to the WSGI server's sendfile. Detail pages are published as pre-rendered
+fragments of the per-entry card, named by a hash of everything that goes
+into them, so a rebuild only re-renders entries that actually changed.
+The page chrome around a fragment (navigation, CSRF token, admin actions)
+is per-user and is still rendered per request.
+"""
+
+import gzip
+import hashlib
+import os
+
+from flask import current_app
+from markupsafe import Markup
+
+PUBLISHED_DIR = "published"
+DETAIL_TEMPLATE = "catalog/_detail_card.html"
+
+
+def payload_path(published_dir, version, compressed=False):
+    name = f"software-{version}.json"
+    return os.path.join(published_dir, name + ".gz" if compressed else name)
+
+
+def detail_path(published_dir, software_id, key):
+    return os.path.join(published_dir, "detail", f"{software_id}-{key:016x}.html")
+
+
+def render_detail(software, logo):
+    """Render the detail card for ``software`` (a model instance) showing ``logo``."""
+    template = current_app.jinja_env.get_template(DETAIL_TEMPLATE)
+    return Markup(template.render(software=software, logo=logo))
+
+
+def publish_payload(published_dir, version, entries_json):
+    """Write the /api/software payload for ``version``, plain and gzipped."""
+    os.makedirs(published_dir, exist_ok=True)
+    write_atomic(payload_path(published_dir, version), entries_json)
+    write_atomic(
+        payload_path(published_dir, version, compressed=True),
+        gzip.compress(entries_json, compresslevel=6, mtime=0),
+    )
+
+
+def publish_details(published_dir, software, entry_json, logo_urls):
+    """Render missing detail fragments; returns ``{software_id: key}``.
+
+    ``entry_json`` maps ids to their serialized snapshot entry (which includes
+    the logo URL to show), which together with the long description and the
+    template source determines the output. ``logo_urls`` maps external logo
+    URLs to their locally cached copies.
+    """
+    detail_dir = os.path.join(published_dir, "detail")
+    os.makedirs(detail_dir, exist_ok=True)
+    template_hash = _template_fingerprint()
+
+    keys = {}
+    for s in software:
+        digest = hashlib.sha256(template_hash)
+        digest.update(entry_json[s.id])
+        digest.update((s.content or "").encode())
+        key = int.from_bytes(digest.digest()[:8], "little")
+        path = detail_path(published_dir, s.id, key)
+        if not os.path.exists(path):
+            write_atomic(path, render_detail(s, logo_urls.get(s.logo, s.logo)).encode())
+        keys[s.id] = key
+    return keys
+
+
+def remove_stale(published_dir, keep_versions, keys):
+    """Delete payloads older than ``keep_versions`` and unreferenced fragments."""
+    for name in os.listdir(published_dir):
+        if name.startswith("software-"):
+            try:
+                version = int(name.split("-", 1)[1].split(".", 1)[0])
+            except ValueError:
+                continue
+            if version not in keep_versions:
+                os.remove(os.path.join(published_dir, name))
+
+    detail_dir = os.path.join(published_dir, "detail")
+    current = {os.path.basename(detail_path(published_dir, i, k)) for i, k in keys.items()}
+    for name in os.listdir(detail_dir):
+        if name not in current:
+            os.remove(os.path.join(detail_dir, name))
+
+
+def _template_fingerprint():
+    source, _, _ = current_app.jinja_env.loader.get_source(current_app.jinja_env, DETAIL_TEMPLATE)
+    return hashlib.sha256(source.encode()).digest()
+
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
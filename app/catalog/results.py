@@ -0,0 +1,100 @@
+"""Per-process LRU cache of api_software result id lists.
+
+Filtered and searched catalog requests repeat the same few combinations all
+day ("DPA Active" + "Free Application", ...). Their results are cached as id
+lists keyed on the normalized ``(q, sorted category ids)`` and rendered from
+the shared snapshot, so a repeated combination touches neither the database
+nor the search index. The cache belongs to one catalog version: once an
+admin write has moved the snapshot to a new version, the next lookup empties
+it.
+
+A single result can hold most of the catalog ("DPA Active" is over half of
+it), so the cache is bounded by the total number of ids it holds rather
+than by its number of entries.
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.metrics.instrumentation import record_cache_lookup
+
+
+def result_key(search, category_ids):
+    """Normalize request parameters into a cache key.
+
+    Matching ignores case, and repeated category ids do not change the results.
+    """
+    return search.lower(), tuple(sorted(set(category_ids)))
+
+
+class ResultCache:
+    """LRU mapping result keys to id arrays for one catalog version.
+
+    Holds at most ``max_ids`` ids across all entries (8 bytes each).
+    """
+
+    def __init__(self, max_ids):
+        self.max_ids = max_ids
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        """Return the cached ids for ``key``, or None."""
+        with self._lock:
+            self._check_version(version)
+            ids = self._entries.get(key)
+            if ids is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        record_cache_lookup("api_software_results", ids is not None)
+        return ids
+
+    def put(self, version, key, ids):
+        if self.max_ids <= 0 or len(ids) > self.max_ids:
+            return  # disabled, or larger than the whole budget
+        with self._lock:
+            self._check_version(version)
+            if version != self._version:
+                return  # computed against a snapshot that is already outdated
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = array("q", ids)
+            self._size += len(ids)
+            while self._size > self.max_ids:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        # Versions only grow, so an older one is a request that raced a rebuild
+        if self._version is None or version > self._version:
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+
+
+def get_result_cache():
+    """Return this process's result cache."""
+    cache = current_app.extensions.get("catalog_results")
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            "catalog_results", ResultCache(current_app.config["RESULT_CACHE_MAX_IDS"])
+        )
+    return cache
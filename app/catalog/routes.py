@@ -1,11 +1,33 @@
-from flask import Blueprint, render_template, request, jsonify
-from flask_login import login_required
+import json
+import re
+from collections import Counter
 
-from app import db
-from app.models import Software, Category
+from flask import (
+    Blueprint, Response, abort, current_app, render_template, request, jsonify,
+    send_file, send_from_directory,
+)
+from flask_limiter.util import get_remote_address
+from flask_login import current_user, login_required
+from markupsafe import Markup
+from sqlalchemy.orm import selectinload, undefer
+
+from app import db, limiter
+from app.catalog import publish
+from app.catalog.logos import logo_dir
+from app.catalog.results import get_result_cache, result_key
+from app.catalog.search import get_search_index, get_suggest_index
+from app.catalog.snapshot import entry_dict, get_snapshot, published_dir, ready_logo_urls
+from app.profiling import span
+from app.models import CachedLogo, Software, Category, software_categories
 
 catalog_bp = Blueprint("catalog", __name__)
 
+_MAX_SUGGESTIONS = 10
+# Fuzzy matches considered per search; exact substring matches are not capped
+_MAX_FUZZY_MATCHES = 500
+_LOGO_NAME_RE = re.compile(r"[0-9a-f]{64}\.webp")
+_ONE_YEAR = 365 * 24 * 3600
+
 
 @catalog_bp.route("/")
 @login_required
@@ -34,64 +56,209 @@ def index():
     )
 
 
+def _user_or_ip():
+    """Rate-limit key: the signed-in user, since a whole school shares one NAT address."""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return get_remote_address()
+
+
 @catalog_bp.route("/api/software")
 @login_required
+@limiter.limit(lambda: current_app.config["API_RATE_LIMIT"], key_func=_user_or_ip)
 def api_software():
     """JSON API for software entries, supports search and category filters."""
     search = request.args.get("q", "").strip()
     category_ids = request.args.getlist("cat", type=int)
 
-    query = Software.query
+    snapshot = get_snapshot()
+    if snapshot is None:
+        # Nothing published yet, or a catalog change is still being published
+        return _software_from_db(search, category_ids)
+    if not search and not category_ids:
+        # The whole catalog is published as a static file for this version
+        with span("serialize"):
+            return _published_payload(snapshot)
+
+    # Repeated q/cat combinations are answered from the per-process cache
+    cache = get_result_cache()
+    key = result_key(search, category_ids)
+    ids = cache.get(snapshot.version, key)
+    if ids is None:
+        index = get_search_index() if search else None
+        if index is not None and index.version != snapshot.version:
+            # This process is still indexing the new snapshot
+            return _software_from_db(search, category_ids)
+        ids = _matching_ids(snapshot, index, search, category_ids)
+        cache.put(snapshot.version, key, ids)
+
+    with span("serialize"):
+        body = snapshot.render(ids)
+        return Response(body, mimetype="application/json")
+
+
+def _matching_ids(snapshot, index, search, category_ids):
+    """Ids of entries matching ``search`` and every category, in result order.
+
+    ``index`` is the search index built from ``snapshot``.
+    """
+    # Text matching runs on the in-memory index and ordering on the snapshot;
+    # only the category restriction is a database query
+    ids = None
 
     if search:
-        like = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                Software.name.ilike(like),
-                Software.tagline.ilike(like),
-            )
+        exact = set(index.containing(search))
+        # Typo-tolerant matches on top of exact substrings, best ones only
+        fuzzy_scores = index.search(
+            search, current_app.config["SEARCH_FUZZY_THRESHOLD"], limit=_MAX_FUZZY_MATCHES
         )
+        ids = exact.union(fuzzy_scores)
 
     if category_ids:
-        valid_ids = {
-            c.id for c in Category.query.filter(Category.id.in_(category_ids)).all()
-        }
-        category_ids = [cid for cid in category_ids if cid in valid_ids]
-        for cat_id in category_ids:
-            query = query.filter(
-                Software.categories.any(Category.id == cat_id)
-            )
+        members = _category_members(category_ids)
+        if members is not None:
+            ids = members if ids is None else ids & members
+
+    if ids is None:
+        # Only unknown categories were asked for: they filter nothing
+        ids = snapshot.ids()
+
+    # Featured first, then alphabetical: the snapshot's catalog order
+    result = sorted(ids, key=snapshot.position)
+    if search:
+        # Exact substring matches first, then fuzzy matches by similarity;
+        # the sort is stable, so catalog order breaks ties
+        result.sort(key=lambda i: 1.0 if i in exact else fuzzy_scores[i], reverse=True)
+    return result
+
+
+def _software_from_db(search, category_ids):
+    """The /api/software response read straight from the database.
+
+    Only used while no snapshot (or search index) covers the latest catalog
+    change, typically for a few seconds after an admin write, so it matches
+    plain substrings without the fuzzy search.
+    """
+    query = Software.query.options(selectinload(Software.categories))
+    if search:
+        like = f"%{search}%"
+        query = query.filter(db.or_(Software.name.ilike(like), Software.tagline.ilike(like)))
+    software = query.order_by(Software.featured.desc(), Software.name).all()
 
-    # Featured first, then alphabetical
-    software = query.order_by(
-        Software.featured.desc(), Software.name
+    if category_ids:
+        members = _category_members(category_ids)
+        if members is not None:
+            software = [s for s in software if s.id in members]
+
+    logo_urls = ready_logo_urls()
+    return jsonify([entry_dict(s, logo_urls) for s in software])
+
+
+def _category_members(category_ids):
+    """Ids of entries in every one of ``category_ids``, or None if none of them exist.
+
+    Unknown ids are ignored. The ids are bound as one JSON parameter, so the
+    query never runs into SQLite's bound-variable limit.
+    """
+    requested = db.func.json_each(json.dumps(sorted(set(category_ids)))).table_valued("value")
+    valid = db.session.scalars(
+        db.select(requested.c.value).where(
+            db.exists().where(Category.id == requested.c.value)
+        )
     ).all()
+    if not valid:
+        return None
+
+    # Members of each category come from the category_id index; an entry
+    # listed once per category is in all of them. Counting here rather than
+    # with GROUP BY keeps SQLite from walking the whole table in entry order.
+    wanted = db.func.json_each(json.dumps(valid)).table_valued("value")
+    counts = Counter(db.session.scalars(
+        db.select(software_categories.c.software_id)
+        .where(software_categories.c.category_id.in_(db.select(wanted.c.value)))
+    ))
+    return {software_id for software_id, n in counts.items() if n == len(valid)}
 
-    results = []
-    for s in software:
-        cats = []
-        for c in s.categories:
-            cats.append({
-                "id": c.id,
-                "name": c.name,
-                "type": c.category_type,
-            })
-        results.append({
-            "id": s.id,
-            "name": s.name,
-            "url": s.url,
-            "tagline": s.tagline,
-            "logo": s.logo,
-            "featured": s.featured,
-            "categories": cats,
-        })
-
-    return jsonify(results)
+
+def _published_payload(snapshot):
+    """Send the published /api/software file, precompressed when the client allows."""
+    compressed = request.accept_encodings["gzip"] > 0
+    path = publish.payload_path(published_dir(), snapshot.version, compressed=compressed)
+    try:
+        response = send_file(
+            path,
+            mimetype="application/json",
+            conditional=True,
+            etag=f"catalog-{snapshot.version}{'-gzip' if compressed else ''}",
+            max_age=0,
+        )
+    except FileNotFoundError:
+        # Removed by a newer rebuild between the version check and the open
+        response = Response(bytes(snapshot.entries_json), mimetype="application/json")
+        compressed = False
+    if compressed:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.cache_control.private = True
+    return response
+
+
+@catalog_bp.route("/api/suggest")
+@login_required
+@limiter.limit(lambda: current_app.config["SUGGEST_RATE_LIMIT"], key_func=_user_or_ip)
+def api_suggest():
+    """Typeahead suggestions for software and category names, from the prefix index."""
+    prefix = request.args.get("q", "").strip()
+    limit = request.args.get("limit", 8, type=int)
+    limit = max(1, min(limit, _MAX_SUGGESTIONS))
+    index = get_suggest_index()
+    if index is None:
+        # Nothing is published yet
+        return jsonify([])
+    return jsonify(index.suggest(prefix, limit))
 
 
 @catalog_bp.route("/software/<int:software_id>")
 @login_required
 def detail(software_id):
     """Detail view for a single software entry."""
-    software = db.get_or_404(Software, software_id)
-    return render_template("catalog/detail.html", software=software)
+    snapshot = get_snapshot()
+    # Without a current snapshot the entry may be new or deleted: ask the database
+    key = snapshot.detail_key(software_id) if snapshot is not None else None
+    if key is not None:
+        try:
+            with open(publish.detail_path(published_dir(), software_id, key), encoding="utf-8") as f:
+                detail_html = Markup(f.read())
+        except FileNotFoundError:
+            pass
+        else:
+            # The published card has everything else; the page only needs id and name
+            entry = json.loads(bytes(snapshot.entry_json(software_id)))
+            return render_template(
+                "catalog/detail.html",
+                software={"id": entry["id"], "name": entry["name"]},
+                detail_html=detail_html,
+            )
+
+    software = db.get_or_404(Software, software_id, options=[undefer(Software.content)])
+    cached = CachedLogo.query.filter_by(url=software.logo, status="ready").first()
+    return render_template(
+        "catalog/detail.html",
+        software=software,
+        detail_html=publish.render_detail(software, cached.local_url if cached else software.logo),
+    )
+
+
+@catalog_bp.route("/logos/<name>")
+@login_required
+def logo(name):
+    """Locally cached logo thumbnail; names are content hashes, so they never change."""
+    if not _LOGO_NAME_RE.fullmatch(name):
+        abort(404)
+    response = send_from_directory(logo_dir(), name, mimetype="image/webp", max_age=_ONE_YEAR)
+    response.cache_control.immutable = True
+    # Signed-in users only: browsers may keep it, shared proxies must not
+    # (send_from_directory marks responses with a max_age public)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,285 @@
+"""In-memory search indexes over the catalog.
+
+TrigramIndex backs typo-tolerant search in api_software; PrefixIndex backs
+the typeahead in api_suggest. Both are built per process from the shared
+catalog snapshot (no database queries). When the snapshot version changes,
+the new index is built on a background thread while requests keep using the
+previous one, so no request waits for a rebuild.
+
+For trigram matching, every distinct word in names and taglines is split into padded
+trigrams (``"class"`` -> ``"  c", " cl", "cla", "las", "ass", "ss "``, the same
+scheme as PostgreSQL's pg_trgm). Looking a query word up only touches the
+posting lists of its own trigrams, so matching cost depends on how many words
+share trigrams with the query, not on the size of the catalog.
+
+A document matches when every query word is similar to at least one of its
+words; its score is the mean of those best per-word similarities.
+
+The trigram index also answers plain substring searches: names and taglines
+are kept lowercased in one string, so ``containing`` is a ``str.find`` loop
+that only steps through the matching entries.
+"""
+
+import heapq
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from flask import current_app
+
+from app.catalog.snapshot import published_snapshot
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_MIN_WORD_LENGTH = 3
+# Separate fields and entries in TrigramIndex's text, so a match never spans two
+_FIELD_SEP = "\x1f"
+_DOC_SEP = "\x1e"
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, rows):
+        """Build the index from ``(id, name, tagline)`` rows."""
+        word_docs = {}
+        self._doc_ids = []
+        self._doc_starts = []
+        texts = []
+        position = 0
+        for software_id, name, tagline in rows:
+            for word in _words(name) + _words(tagline):
+                word_docs.setdefault(word, set()).add(software_id)
+            text = f"{name or ''}{_FIELD_SEP}{tagline or ''}".lower()
+            self._doc_ids.append(software_id)
+            self._doc_starts.append(position)
+            texts.append(text)
+            position += len(text) + 1
+        self._text = _DOC_SEP.join(texts)
+
+        self._words = list(word_docs)
+        self._word_docs = [word_docs[w] for w in self._words]
+        self._trigram_counts = []
+        self._postings = {}
+        for i, word in enumerate(self._words):
+            trigrams = _trigrams(word)
+            self._trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, []).append(i)
+
+    def containing(self, needle):
+        """Ids of documents whose name or tagline contains ``needle``, ignoring case."""
+        needle = needle.lower()
+        if not needle or _FIELD_SEP in needle or _DOC_SEP in needle:
+            return []
+        matches = []
+        find, starts = self._text.find, self._doc_starts
+        pos = find(needle)
+        while pos != -1:
+            doc = bisect_right(starts, pos) - 1
+            matches.append(self._doc_ids[doc])
+            # Continue from the next document; one hit per document is enough
+            if doc + 1 == len(starts):
+                break
+            pos = find(needle, starts[doc + 1])
+        return matches
+
+    def search(self, query, threshold, limit=None):
+        """Return ``{software_id: score}`` for documents matching every query word.
+
+        With ``limit``, only the ``limit`` best-scoring documents are returned.
+        """
+        query_words = [w for w in dict.fromkeys(_words(query)) if len(w) >= _MIN_WORD_LENGTH]
+        if not query_words:
+            return {}
+
+        totals = None
+        for query_word in query_words:
+            best = self._match_word(query_word, threshold)
+            if totals is None:
+                totals = best
+            else:
+                totals = {
+                    doc: totals[doc] + score
+                    for doc, score in best.items() if doc in totals
+                }
+            if not totals:
+                return {}
+
+        if limit is not None and len(totals) > limit:
+            totals = dict(heapq.nlargest(limit, totals.items(), key=lambda item: item[1]))
+        return {doc: total / len(query_words) for doc, total in totals.items()}
+
+    def _match_word(self, query_word, threshold):
+        """Best similarity per document for one query word (Jaccard over trigrams)."""
+        trigrams = _trigrams(query_word)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._postings.get(trigram, ()))
+
+        best = {}
+        for i, common in shared.items():
+            similarity = common / (len(trigrams) + self._trigram_counts[i] - common)
+            if similarity < threshold:
+                continue
+            for doc in self._word_docs[i]:
+                if similarity > best.get(doc, 0.0):
+                    best[doc] = similarity
+        return best
+
+
+class PrefixIndex:
+    """Sorted keys for prefix lookups over software and category names.
+
+    Every name is indexed from each of its word starts, so "class" finds
+    "Google Classroom" as well as "ClassLink".
+    """
+
+    def __init__(self, software_rows, category_rows):
+        """Build from ``(id, name)`` software rows and ``(id, name, type)`` category rows."""
+        items = []
+        for software_id, name in software_rows:
+            items.append(("software", software_id, name, None))
+        for category_id, name, category_type in category_rows:
+            items.append(("category", category_id, name, category_type))
+
+        # Whole names and later word starts are kept apart: any whole-name
+        # match outranks every word match, so the second list is only read
+        # when the first runs short
+        names, words_from = [], []
+        for item_no, (_, _, name, _) in enumerate(items):
+            words = _words(name)
+            for start in range(len(words)):
+                target = names if start == 0 else words_from
+                target.append((" ".join(words[start:]), item_no))
+        names.sort()
+        words_from.sort()
+
+        self._items = items
+        self._rank = [(len(name), name.lower()) for _, _, name, _ in items]
+        self._name_keys = [key for key, _ in names]
+        self._name_items = [item_no for _, item_no in names]
+        self._word_keys = [key for key, _ in words_from]
+        self._word_items = [item_no for _, item_no in words_from]
+
+    def _best(self, keys, item_nos, prefix, limit, exclude=()):
+        """Up to ``limit`` distinct items under ``prefix``, shortest names first."""
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\U0010ffff", start)
+        candidates = set(item_nos[start:end]).difference(exclude)
+        return heapq.nsmallest(limit, candidates, key=self._rank.__getitem__)
+
+    def suggest(self, prefix, limit):
+        """Return up to ``limit`` items whose name has a word starting with ``prefix``.
+
+        Whole-name matches come first, then shorter names. Every key under
+        the prefix is ranked, so short names are found however many longer
+        ones share the prefix.
+        """
+        prefix = " ".join(_words(prefix))
+        if not prefix or limit <= 0:
+            return []
+
+        ranked = self._best(self._name_keys, self._name_items, prefix, limit)
+        if len(ranked) < limit:
+            ranked += self._best(
+                self._word_keys, self._word_items, prefix, limit - len(ranked), exclude=ranked
+            )
+        results = []
+        for item_no in ranked:
+            kind, item_id, name, category_type = self._items[item_no]
+            result = {"kind": kind, "id": item_id, "name": name}
+            if category_type:
+                result["type"] = category_type
+            results.append(result)
+        return results
+
+
+def _cached_index(name, build, inline=False):
+    """Return the named per-app index, starting a rebuild if the snapshot is newer.
+
+    The returned index's ``version`` is the snapshot version it was built
+    from; it lags the current snapshot while a rebuild is running. A process
+    with no index at all (or ``inline=True``) builds one before returning.
+    Returns None before the first snapshot is published.
+    """
+    state = current_app.extensions.setdefault(
+        name, {"index": None, "building": None, "lock": threading.Lock()}
+    )
+    snapshot = published_snapshot()
+    if snapshot is None:
+        return None
+    index = state["index"]
+    if index is not None and index.version == snapshot.version:
+        return index
+
+    with state["lock"]:
+        if state["index"] is None or inline:
+            state["index"] = _build(build, snapshot)
+        elif state["index"].version != snapshot.version and state["building"] is None:
+            state["building"] = threading.Thread(
+                target=_rebuild_in_background,
+                args=(current_app._get_current_object(), state, build, snapshot),
+                name=f"{name}-rebuild",
+                daemon=True,
+            )
+            state["building"].start()
+        return state["index"]
+
+
+def _build(build, snapshot):
+    index = build(snapshot)
+    index.version = snapshot.version
+    return index
+
+
+def _rebuild_in_background(app, state, build, snapshot):
+    try:
+        index = _build(build, snapshot)
+        with state["lock"]:
+            # Versions only grow; never replace a newer index with an older one
+            if index.version > state["index"].version:
+                state["index"] = index
+    except Exception:
+        app.logger.exception("Rebuilding a catalog search index failed")
+    finally:
+        with state["lock"]:
+            state["building"] = None
+
+
+def _search_index(snapshot):
+    return TrigramIndex((e["id"], e["name"], e["tagline"]) for e in snapshot.entries())
+
+
+def _suggest_index(snapshot):
+    return PrefixIndex(
+        ((e["id"], e["name"]) for e in snapshot.entries()),
+        ((c["id"], c["name"], c["type"]) for c in snapshot.categories()),
+    )
+
+
+def get_search_index():
+    """Return this process's trigram index over software names and taglines, or None."""
+    return _cached_index("catalog_search", _search_index)
+
+
+def get_suggest_index():
+    """Return this process's prefix index over software and category names, or None.
+
+    Suggestions come from the latest published snapshot, so a catalog change
+    reaches them once its rebuild is published.
+    """
+    return _cached_index("catalog_suggest", _suggest_index)
+
+
+def warm_indexes():
+    """Build both indexes for the published snapshot now, so searches don't wait or lag."""
+    _cached_index("catalog_search", _search_index, inline=True)
+    _cached_index("catalog_suggest", _suggest_index, inline=True)
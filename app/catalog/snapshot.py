@@ -0,0 +1,467 @@
+"""Read-mostly catalog snapshot shared by every worker through mmap.
+
+After an admin write, the process that made it serializes the whole catalog
+once into an immutable ``catalog-<version>.snap`` file in the instance
+directory and then bumps a version counter in a small control file. Every
+worker keeps both files memory-mapped: checking for a new version on each
+request is a read from the shared control mapping (no syscall), and serving
+entries slices bytes straight out of the shared page cache, so neither memory
+nor rebuild work grows with the number of workers.
+
+Snapshot layout (little endian):
+
+    header      magic, version, entry count, category count,
+                offset/length of the entries JSON array,
+                offset/length of the categories JSON array
+    id table    entry ids sorted ascending           (u64 x count)
+    pos table   byte offset of each id's JSON object  (u64 x count)
+    len table   byte length of each id's JSON object  (u64 x count)
+    key table   published detail fragment key per id  (u64 x count)
+    entries     JSON array of /api/software entries, in catalog order
+    categories  JSON array of {"id", "name", "type"}
+
+The same rebuild also writes the static files in ``app.catalog.publish``
+before the new version becomes visible to workers. Admin writes only call
+``schedule_rebuild``: a background thread does the rebuild, so saving an
+entry never waits for the whole catalog to be re-serialized, and a burst of
+writes is folded into one or two rebuilds.
+
+Each write also bumps a catalog generation in the control file, and every
+snapshot records the generation it was built from. Until a snapshot covers
+the latest write, ``get_snapshot`` returns None and requests read the
+database instead, so an added or deleted entry shows up as soon as the write
+commits. Processes only map snapshots: nothing is built at startup, and a
+missing snapshot is built by ``publish-catalog`` or in the background.
+"""
+
+import atexit
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.orm import selectinload, undefer
+
+from app import db
+from app.catalog import publish
+from app.models import CachedLogo, Category, Software
+
+_MAGIC = b"CATSNAP1"
+_HEADER = struct.Struct("<8sQQQQQQQ")
+_VERSION = struct.Struct("<Q")
+# Control file: published version, the catalog generation it was built from,
+# and the generation admin writes have reached
+_CONTROL = struct.Struct("<QQQ")
+_GENERATION_OFFSET = 16
+_SNAPSHOT_DIR = "snapshots"
+_CONTROL_FILE = "catalog.version"
+_LOCK_FILE = ".lock"
+_KEEP_VERSIONS = 3
+# How long an exiting worker waits for a scheduled rebuild to finish
+_EXIT_WAIT = 60
+
+
+def entry_dict(software, logo_urls):
+    """The /api/software representation of one entry.
+
+    ``logo_urls`` maps external logo URLs to locally cached copies; logos
+    that have not been cached yet are passed through unchanged.
+    """
+    return {
+        "id": software.id,
+        "name": software.name,
+        "url": software.url,
+        "tagline": software.tagline,
+        "logo": logo_urls.get(software.logo, software.logo),
+        "featured": software.featured,
+        "categories": [
+            {"id": c.id, "name": c.name, "type": c.category_type}
+            for c in software.categories
+        ],
+    }
+
+
+class Snapshot:
+    """One mapped snapshot file. Slices are zero-copy views into the mapping."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.version, self.count, self.category_count,
+         entries_offset, entries_length,
+         categories_offset, categories_length) = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+
+        view = memoryview(self._mm)
+        table = _HEADER.size
+        width = self.count * 8
+        self._ids = view[table:table + width].cast("Q")
+        self._positions = view[table + width:table + 2 * width].cast("Q")
+        self._lengths = view[table + 2 * width:table + 3 * width].cast("Q")
+        self._detail_keys = view[table + 3 * width:table + 4 * width].cast("Q")
+        self.entries_json = view[entries_offset:entries_offset + entries_length]
+        self.categories_json = view[categories_offset:categories_offset + categories_length]
+
+    def _find(self, software_id):
+        i = bisect_left(self._ids, software_id)
+        if i == self.count or self._ids[i] != software_id:
+            return None
+        return i
+
+    def entry_json(self, software_id):
+        """The serialized entry for ``software_id``, or None if it is not in this snapshot."""
+        i = self._find(software_id)
+        if i is None:
+            return None
+        start = self._positions[i]
+        return self.entries_json[start:start + self._lengths[i]]
+
+    def ids(self):
+        """Every entry id in this snapshot."""
+        return list(self._ids)
+
+    def position(self, software_id):
+        """Sort key giving catalog order (featured first, then by name).
+
+        Entries are written in catalog order, so their byte offsets sort the
+        same way. Ids missing from this snapshot sort last.
+        """
+        i = self._find(software_id)
+        return len(self.entries_json) if i is None else self._positions[i]
+
+    def detail_key(self, software_id):
+        """Key of the published detail fragment for ``software_id``, or None."""
+        i = self._find(software_id)
+        return None if i is None else self._detail_keys[i]
+
+    def render(self, software_ids):
+        """JSON array bytes for ``software_ids``, in the given order."""
+        parts = [self.entry_json(i) for i in software_ids]
+        return b"[" + b",".join(p for p in parts if p is not None) + b"]"
+
+    def entries(self):
+        """Parse every entry (used to build per-process search indexes)."""
+        return json.loads(bytes(self.entries_json))
+
+    def categories(self):
+        return json.loads(bytes(self.categories_json))
+
+
+class SnapshotStore:
+    """Per-process handle on the shared control word and current snapshot."""
+
+    def __init__(self, instance_path):
+        self._dir = os.path.join(instance_path, _SNAPSHOT_DIR)
+        self.published_dir = os.path.join(instance_path, publish.PUBLISHED_DIR)
+        self._control_path = os.path.join(instance_path, _CONTROL_FILE)
+        self._control = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Return the latest published snapshot, or None before the first publish.
+
+        Only maps files that ``rebuild`` has written; it never builds one.
+        """
+        snapshot = self._snapshot
+        version = self._control_version()
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            version = self._control_version()
+            if version and (self._snapshot is None or self._snapshot.version != version):
+                try:
+                    self._snapshot = Snapshot(self._snapshot_path(version))
+                except FileNotFoundError:
+                    # Removed by hand; keep serving what is mapped until republished
+                    pass
+            return self._snapshot
+
+    def is_stale(self):
+        """True while a catalog change is newer than the published snapshot."""
+        _, built, generation = self._control_state()
+        return built < generation
+
+    def mark_changed(self):
+        """Record a committed catalog write; the snapshot is stale until rebuilt."""
+        if self._control is None:
+            self._open_control()
+        fd = os.open(self._control_path, os.O_RDWR)
+        try:
+            # Writers in every process bump the same counter
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            generation = _VERSION.unpack(os.pread(fd, _VERSION.size, _GENERATION_OFFSET))[0]
+            os.pwrite(fd, _VERSION.pack(generation + 1), _GENERATION_OFFSET)
+        finally:
+            os.close(fd)
+
+    def rebuild(self, only_if_stale=False):
+        """Serialize the catalog into a new snapshot and publish it; returns its version.
+
+        Builders on the same host serialize on a file lock, so concurrent
+        callers never publish out of order. With ``only_if_stale``, a
+        published snapshot that already covers every catalog change is
+        reused instead of rebuilt. A rebuild that serializes to the same
+        bytes as the published snapshot keeps its version, so ETags and
+        per-worker caches stay valid.
+        """
+        os.makedirs(self._dir, exist_ok=True)
+        with open(os.path.join(self._dir, _LOCK_FILE), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Read before the catalog: writes bumping it later are not covered
+            version, built, generation = self._control_state()
+            if (only_if_stale and version and built >= generation
+                    and os.path.exists(self._snapshot_path(version))):
+                return version
+
+            data, entries_json, detail_keys = _build_snapshot(version + 1, self.published_dir)
+            if self._unchanged(version, data):
+                self._write_version(version, generation)
+                return version
+
+            version += 1
+            publish.publish_payload(self.published_dir, version, entries_json)
+
+            path = self._snapshot_path(version)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._write_version(version, generation)
+            self._remove_old(version)
+            publish.remove_stale(
+                self.published_dir,
+                range(version - _KEEP_VERSIONS + 1, version + 1),
+                detail_keys,
+            )
+            return version
+
+    def _unchanged(self, version, data):
+        """True if snapshot ``version`` is fully published and holds ``data`` but for the version."""
+        payloads = [
+            publish.payload_path(self.published_dir, version, compressed=compressed)
+            for compressed in (False, True)
+        ]
+        if not version or not all(os.path.exists(path) for path in payloads):
+            return False
+        try:
+            with open(self._snapshot_path(version), "rb") as f:
+                published = f.read()
+        except FileNotFoundError:
+            return False
+        # The version field follows the magic in the header
+        start, end = len(_MAGIC), len(_MAGIC) + _VERSION.size
+        return published[:start] == data[:start] and published[end:] == data[end:]
+
+    def _control_version(self):
+        return self._control_state()[0]
+
+    def _control_state(self):
+        """(published version, generation it covers, latest catalog generation)."""
+        if self._control is None:
+            self._open_control()
+        return _CONTROL.unpack_from(self._control, 0)
+
+    def _open_control(self):
+        os.makedirs(os.path.dirname(self._control_path), exist_ok=True)
+        fd = os.open(self._control_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            size = os.fstat(fd).st_size
+            if size != _CONTROL.size:
+                if size != _VERSION.size:
+                    # New file, or the stamp file written by older releases
+                    os.ftruncate(fd, 0)
+                # A bare version from older releases keeps its value
+                os.ftruncate(fd, _CONTROL.size)
+            self._control = mmap.mmap(fd, _CONTROL.size, access=mmap.ACCESS_READ)
+        finally:
+            # The mapping holds a duplicate of fd, so closing alone keeps the lock
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _write_version(self, version, generation):
+        fd = os.open(self._control_path, os.O_RDWR)
+        try:
+            # One write for both words; the generation counter after them is left alone
+            os.pwrite(fd, _VERSION.pack(version) + _VERSION.pack(generation), 0)
+        finally:
+            os.close(fd)
+
+    def _snapshot_path(self, version):
+        return os.path.join(self._dir, f"catalog-{version}.snap")
+
+    def _remove_old(self, version):
+        # Workers still mapping an unlinked file keep reading it safely
+        for name in os.listdir(self._dir):
+            if not (name.startswith("catalog-") and name.endswith(".snap")):
+                continue
+            try:
+                file_version = int(name[len("catalog-"):-len(".snap")])
+            except ValueError:
+                continue
+            if file_version <= version - _KEEP_VERSIONS:
+                os.remove(os.path.join(self._dir, name))
+
+
+def _build_snapshot(version, published_dir):
+    """Serialize the catalog; returns (snapshot bytes, entries JSON, detail keys)."""
+    software = (
+        # Content only feeds the published detail fragments
+        Software.query.options(selectinload(Software.categories), undefer(Software.content))
+        .order_by(Software.featured.desc(), Software.name)
+        .all()
+    )
+    categories = Category.query.order_by(Category.name).all()
+    logo_urls = ready_logo_urls()
+
+    chunks = {}
+    offsets = {}
+    position = 1  # after the opening "["
+    for s in software:
+        data = json.dumps(entry_dict(s, logo_urls), ensure_ascii=False, separators=(",", ":")).encode()
+        offsets[s.id] = (position, len(data))
+        chunks[s.id] = data
+        position += len(data) + 1  # the "," separator
+    entries_json = b"[" + b",".join(chunks.values()) + b"]"
+    detail_keys = publish.publish_details(published_dir, software, chunks, logo_urls)
+    categories_json = json.dumps(
+        [{"id": c.id, "name": c.name, "type": c.category_type} for c in categories],
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode()
+
+    ids = sorted(offsets)
+    count = len(ids)
+    tables = (
+        struct.pack(f"<{count}Q", *ids)
+        + struct.pack(f"<{count}Q", *(offsets[i][0] for i in ids))
+        + struct.pack(f"<{count}Q", *(offsets[i][1] for i in ids))
+        + struct.pack(f"<{count}Q", *(detail_keys[i] for i in ids))
+    )
+    entries_offset = _HEADER.size + len(tables)
+    categories_offset = entries_offset + len(entries_json)
+    header = _HEADER.pack(
+        _MAGIC, version, count, len(categories),
+        entries_offset, len(entries_json),
+        categories_offset, len(categories_json),
+    )
+    return header + tables + entries_json + categories_json, entries_json, detail_keys
+
+
+def ready_logo_urls():
+    """Map of external logo URLs to their locally cached copies."""
+    return {
+        logo.url: logo.local_url
+        for logo in CachedLogo.query.filter_by(status="ready")
+    }
+
+
+class SnapshotBuilder:
+    """Background thread that rebuilds the snapshot when it is scheduled and stale.
+
+    Writes made while a rebuild is running schedule exactly one more, which
+    reads everything committed up to then.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        with self._lock:
+            self._idle.clear()
+            self._wake.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="snapshot-rebuild", daemon=True
+                )
+                self._thread.start()
+
+    def wait(self, timeout=None):
+        """Block until no rebuild is scheduled or running; False on timeout."""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self._app.extensions["catalog_snapshot"].rebuild(only_if_stale=True)
+                except Exception:
+                    self._app.logger.exception("Catalog snapshot rebuild failed")
+                finally:
+                    db.session.remove()
+            with self._lock:
+                if not self._wake.is_set():
+                    self._idle.set()
+
+
+def init_app(app):
+    app.extensions["catalog_snapshot"] = SnapshotStore(app.instance_path)
+    builder = app.extensions["snapshot_builder"] = SnapshotBuilder(app)
+    # The thread is a daemon; don't let a recycled worker drop a pending rebuild
+    atexit.register(builder.wait, _EXIT_WAIT)
+    app.cli.add_command(publish_catalog)
+
+
+def get_snapshot():
+    """The snapshot to answer from, or None if requests must read the database.
+
+    None means nothing is published yet or a catalog change has not been
+    published; a background rebuild is scheduled in either case.
+    """
+    store = current_app.extensions["catalog_snapshot"]
+    snapshot = store.current()
+    if snapshot is not None and not store.is_stale():
+        return snapshot
+    current_app.extensions["snapshot_builder"].schedule()
+    return None
+
+
+def published_snapshot():
+    """The latest published snapshot even if the catalog has changed since, or None."""
+    return current_app.extensions["catalog_snapshot"].current()
+
+
+def rebuild_snapshot():
+    """Publish a fresh snapshot now unless nothing changed; returns the current version."""
+    return current_app.extensions["catalog_snapshot"].rebuild()
+
+
+def schedule_rebuild():
+    """Publish a fresh snapshot in the background after the catalog changed.
+
+    Call it once the change is committed: requests read the database from
+    here until the rebuild is published.
+    """
+    current_app.extensions["catalog_snapshot"].mark_changed()
+    current_app.extensions["snapshot_builder"].schedule()
+
+
+def published_dir():
+    return current_app.extensions["catalog_snapshot"].published_dir
+
+
+@click.command("publish-catalog")
+@with_appcontext
+def publish_catalog():
+    """Rebuild the catalog snapshot and its published static files if the catalog changed."""
+    published = published_snapshot()
+    version = rebuild_snapshot()
+    if published is not None and published.version == version:
+        click.echo(f"Catalog unchanged; still at version {version}.")
+    else:
+        click.echo(f"Published catalog version {version}.")
@@ -43,3 +43,37 @@ class Config:
         for d in os.environ.get("ALLOWED_DOMAINS", "").split(",")
         if d.strip()
     ]
+
+    # Directory for catalog.log (blank: logs/ in the project root)
+    LOG_DIR = os.environ.get("LOG_DIR", "")
+
+    # Minimum trigram similarity (0-1) for typo-tolerant search matches
+    SEARCH_FUZZY_THRESHOLD = float(os.environ.get("SEARCH_FUZZY_THRESHOLD", "0.3"))
+
+    # Total result ids the per-worker /api/software result cache may hold,
+    # 8 bytes each (0 disables)
+    RESULT_CACHE_MAX_IDS = int(os.environ.get("RESULT_CACHE_MAX_IDS", "1000000"))
+
+    # Prometheus metrics at /metrics (admins or localhost only)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+    # Request profiling: "off", "header" (admins sending X-Profile-Token) or "always"
+    PROFILING = os.environ.get("PROFILING", "off").strip().lower()
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0.05"))
+
+    # Local logo cache (app.catalog.logos): thumbnails are capped at this many pixels per side
+    LOGO_CACHE_ENABLED = os.environ.get("LOGO_CACHE_ENABLED", "1") == "1"
+    LOGO_THUMBNAIL_SIZE = int(os.environ.get("LOGO_THUMBNAIL_SIZE", "160"))
+    LOGO_MAX_BYTES = int(os.environ.get("LOGO_MAX_BYTES", str(2 * 1024 * 1024)))
+    LOGO_FETCH_TIMEOUT = float(os.environ.get("LOGO_FETCH_TIMEOUT", "10"))
+
+    # Rate limits. Counters default to a SQLite file in the instance folder
+    # shared by all workers on the host (app.ratelimit); set a storage URI
+    # such as redis://host:6379 to share them between hosts instead.
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "")
+    # Seconds a worker may batch hits before writing them to the shared counters
+    RATELIMIT_SYNC_INTERVAL = float(os.environ.get("RATELIMIT_SYNC_INTERVAL", "0.05"))
+    # Per signed-in user (per IP when anonymous)
+    API_RATE_LIMIT = os.environ.get("API_RATE_LIMIT", "300 per minute")
+    SUGGEST_RATE_LIMIT = os.environ.get("SUGGEST_RATE_LIMIT", "900 per minute")
@@ -0,0 +1,92 @@
+"""Prometheus metrics for requests, SQL statements, caches and rate limiting.
+
+Under gunicorn, ``gunicorn.conf.py`` points ``PROMETHEUS_MULTIPROC_DIR`` at a
+shared directory before the workers import this module, so every worker
+writes its samples there and ``/metrics`` aggregates them.
+"""
+
+import time
+
+from flask import g, request
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+
+from app import db
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+REQUESTS = Counter(
+    "catalog_http_requests_total",
+    "HTTP requests by endpoint, method and status code.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "catalog_http_request_duration_seconds",
+    "HTTP request latency by endpoint.",
+    ["endpoint"],
+    buckets=_LATENCY_BUCKETS,
+)
+SQL_LATENCY = Histogram(
+    "catalog_sql_statement_duration_seconds",
+    "SQL statement execution time by operation.",
+    ["operation"],
+    buckets=_SQL_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "catalog_cache_lookups_total",
+    "Cache lookups by cache name and result (hit or miss).",
+    ["cache", "result"],
+)
+RATE_LIMITED = Counter(
+    "catalog_rate_limit_rejections_total",
+    "Requests rejected by the rate limiter, by endpoint.",
+    ["endpoint"],
+)
+
+
+def init_app(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _statement_started)
+        event.listen(db.engine, "after_cursor_execute", _statement_finished)
+
+
+def record_cache_lookup(cache, hit):
+    """Count a lookup against the named cache."""
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def _start_timer():
+    g._metrics_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return response
+    endpoint = request.endpoint or "unmatched"
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+    if response.status_code == 429:
+        RATE_LIMITED.labels(endpoint).inc()
+    return response
+
+
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_query_start", []).append(time.perf_counter())
+
+
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = statement.lstrip()[:6].upper()
+    SQL_LATENCY.labels(operation if operation in _SQL_OPERATIONS else "OTHER").observe(elapsed)
@@ -0,0 +1,37 @@
+import ipaddress
+import os
+
+from flask import Blueprint, Response, abort, request
+from flask_login import current_user
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client import multiprocess
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+def _is_local_request():
+    """True only for direct loopback connections, not proxied ones."""
+    if request.headers.get("X-Forwarded-For"):
+        return False
+    orig = request.environ.get("werkzeug.proxy_fix.orig", {})
+    remote = orig.get("REMOTE_ADDR", request.remote_addr)
+    try:
+        return ipaddress.ip_address(remote).is_loopback
+    except (TypeError, ValueError):
+        return False
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    """Prometheus text exposition, for admins or scrapers on localhost."""
+    if not _is_local_request() and not (
+        current_user.is_authenticated and current_user.is_admin
+    ):
+        abort(403)
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,31 @@
+"""Lightweight schema upgrades for existing databases.
+
+``db.create_all()`` only creates missing tables, so indexes added to a model
+after a deployment's database was first created are never built. This module
+fills that gap without requiring a full migration framework.
+"""
+
+from sqlalchemy import inspect
+
+
+def upgrade_schema(db):
+    """Create any model indexes that are missing from existing tables."""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=db.engine, checkfirst=True)
+                created.append(index.name)
+
+    if created:
+        # Refresh planner statistics so the new indexes are picked up
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+    return created
@@ -13,6 +13,8 @@ software_categories = db.Table(
     db.Column(
         "category_id", db.Integer, db.ForeignKey("category.id"), primary_key=True
     ),
+    # Reverse of the primary key, used by the category filter in api_software
+    db.Index("ix_software_categories_category_id", "category_id", "software_id"),
 )
 
 
@@ -21,7 +23,9 @@ class Software(db.Model):
     name = db.Column(db.String(200), nullable=False, index=True)
     url = db.Column(db.String(500), default="")
     tagline = db.Column(db.String(500), default="")
-    content = db.Column(db.Text, default="")
+    # Unbounded vendor text: deferred so list queries never load it; undefer
+    # it where it is shown (detail, edit, export and publishing)
+    content = db.deferred(db.Column(db.Text, default=""))
     logo = db.Column(db.String(500), default="")
     featured = db.Column(db.Boolean, default=False)
     created_at = db.Column(
@@ -37,6 +41,11 @@ class Software(db.Model):
         "Category", secondary=software_categories, back_populates="software_items"
     )
 
+    __table_args__ = (
+        # Matches the catalog ordering: featured first, then alphabetical
+        db.Index("ix_software_featured_name", featured.desc(), name),
+    )
+
     def __repr__(self):
         return f"<Software {self.name}>"
 
@@ -122,6 +131,30 @@ class AuditLog(db.Model):
         return f"<AuditLog {self.action} {self.resource_type} by user {self.user_id}>"
 
 
+class CachedLogo(db.Model):
+    """Local copy of an external logo URL, fetched by app.catalog.logos."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)
+    # Statuses: pending, fetching, ready, failed
+    original = db.Column(db.String(64))  # sha256 of the downloaded file
+    thumbnail = db.Column(db.String(64))  # sha256 of the served WebP thumbnail
+    error = db.Column(db.String(200), default="")
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    @property
+    def local_url(self):
+        return f"/logos/{self.thumbnail}.webp"
+
+    def __repr__(self):
+        return f"<CachedLogo {self.url} {self.status}>"
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, int(user_id))
@@ -0,0 +1,162 @@
+"""Opt-in request profiling.
+
+Modes (``PROFILING`` config):
+    off     nothing is registered; zero overhead (default)
+    header  only requests from an admin carrying a valid ``X-Profile-Token``
+    always  every request
+
+Profiled requests get a ``Server-Timing`` header breaking the response time
+down into database, template render and serialization time. When
+``PROFILE_DIR`` is set, a sample of profiled requests (``PROFILE_SAMPLE_RATE``)
+is also run under cProfile and dumped there as ``.pstats`` files.
+"""
+
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import click
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from flask.cli import with_appcontext
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+
+from app import db
+
+PROFILE_HEADER = "X-Profile-Token"
+_TOKEN_SALT = "request-profiling"
+_TOKEN_MAX_AGE = 3600
+
+# cProfile can only have one active profiler per process on Python 3.12+
+_profiler_lock = threading.Lock()
+
+
+def init_app(app):
+    app.cli.add_command(profile_token)
+
+    mode = app.config["PROFILING"]
+    if mode not in ("header", "always"):
+        return
+
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_release_profiler)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _query_started)
+        event.listen(db.engine, "after_cursor_execute", _query_finished)
+
+    app.logger.info(f"Request profiling enabled (mode={mode})")
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the named Server-Timing metric."""
+    timings = g.get("_profile") if has_request_context() else None
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _token_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=_TOKEN_SALT)
+
+
+def _has_valid_token():
+    token = request.headers.get(PROFILE_HEADER)
+    if not token:
+        return False
+    try:
+        _token_serializer().loads(token, max_age=_TOKEN_MAX_AGE)
+    except BadSignature:
+        return False
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def _start_profile():
+    if current_app.config["PROFILING"] != "always" and not _has_valid_token():
+        return
+    g._profile = {"db": 0.0, "render": 0.0, "serialize": 0.0}
+    g._profile_start = time.perf_counter()
+
+    profile_dir = current_app.config["PROFILE_DIR"]
+    if profile_dir and random.random() < current_app.config["PROFILE_SAMPLE_RATE"]:
+        if _profiler_lock.acquire(blocking=False):
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+
+def _finish_profile(response):
+    timings = g.pop("_profile", None)
+    if timings is None:
+        return response
+    total = time.perf_counter() - g.pop("_profile_start")
+
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _dump_profile(profiler, total)
+        _profiler_lock.release()
+
+    metrics = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items() if seconds]
+    metrics.append(f"total;dur={total * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(metrics)
+    return response
+
+
+def _release_profiler(exc):
+    # Only reached with a live profiler when the request errored out
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+
+def _dump_profile(profiler, total):
+    profile_dir = current_app.config["PROFILE_DIR"]
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+    endpoint = (request.endpoint or "unknown").replace(".", "_")
+    path = os.path.join(profile_dir, f"{stamp}-{endpoint}-{total * 1000:.0f}ms.pstats")
+    profiler.dump_stats(path)
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_profile" in g:
+        conn.info.setdefault("_profile_query_start", []).append(time.perf_counter())
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_profile_query_start")
+    if starts and has_request_context() and "_profile" in g:
+        g._profile["db"] += time.perf_counter() - starts.pop()
+
+
+def _render_started(sender, template, context, **extra):
+    if "_profile" in g:
+        g._profile_render_start = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    start = g.pop("_profile_render_start", None)
+    if start is not None and "_profile" in g:
+        g._profile["render"] += time.perf_counter() - start
+
+
+@click.command("profile-token")
+@with_appcontext
+def profile_token():
+    """Print a token for the X-Profile-Token header (valid for one hour, admins only)."""
+    click.echo(_token_serializer().dumps("profile"))
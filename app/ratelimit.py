@@ -0,0 +1,189 @@
+"""Rate-limit counters shared by every worker on a host.
+
+``memory://`` gives each gunicorn worker its own counters, which multiplies
+every limit by the worker count. This registers a ``sqlitewal://<path>``
+storage for Flask-Limiter's fixed-window strategy, backed by one small
+SQLite database in WAL mode that all workers open.
+
+Checks stay cheap by batching: each worker counts hits locally and only
+writes them to the shared table (one transaction for every pending key)
+when a key's view is older than ``sync_interval`` seconds or its window has
+rolled over. Between syncs a worker answers from the last shared count plus
+its own pending hits, so other workers' hits are seen at most
+``sync_interval`` late. Unsynced hits belong to the window they were counted
+in: once it has expired they are dropped, never carried into the next one.
+Expired windows are deleted every ``_PURGE_INTERVAL`` seconds during a sync.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from limits.storage import Storage
+
+_PURGE_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# Adds to the current window, or starts a new one if it has expired
+_UPSERT = """
+INSERT INTO counters (key, count, expires_at) VALUES (:key, :amount, :expires_at)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN counters.expires_at <= :now THEN excluded.count
+                 ELSE counters.count + excluded.count END,
+    expires_at = CASE WHEN counters.expires_at <= :now THEN excluded.expires_at
+                      ELSE counters.expires_at END
+RETURNING count, expires_at
+"""
+
+
+class _Window:
+    """This worker's view of one key: last shared count plus unsynced hits."""
+
+    __slots__ = ("count", "pending", "expires_at", "expiry", "synced")
+
+    def __init__(self, expiry):
+        self.count = 0
+        self.pending = 0
+        self.expires_at = 0.0
+        self.expiry = expiry
+        self.synced = float("-inf")
+
+
+class SQLiteWALStorage(Storage):
+    """Fixed-window counters in a SQLite file shared between processes.
+
+    URI: ``sqlitewal:///absolute/path/ratelimit.db?sync_interval=0.05``
+    (``sync_interval=0`` writes every hit through).
+    """
+
+    STORAGE_SCHEME = ["sqlitewal"]
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        parsed = urlparse(uri)
+        self.path = parsed.path
+        params = parse_qs(parsed.query)
+        self.sync_interval = float(
+            options.get("sync_interval", params.get("sync_interval", ["0.05"])[0])
+        )
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._windows = {}
+        self._last_purge = 0.0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        with self._lock:
+            self._connection()  # drops state inherited across a fork before it is used
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = _Window(expiry)
+            elif window.expires_at <= now:
+                window.pending = 0  # hits from a window that is already over
+            window.pending += amount
+            if window.expires_at <= now or time.monotonic() - window.synced >= self.sync_interval:
+                self._sync(now, key)
+            return window.count + window.pending
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window.expires_at <= now:
+                row = self._connection().execute(
+                    "SELECT count, expires_at FROM counters WHERE key = ?", (key,)
+                ).fetchone()
+                return row[0] if row and row[1] > now else 0
+            return window.count + window.pending
+
+    def get_expiry(self, key):
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and window.expires_at > time.time():
+                return window.expires_at
+            row = self._connection().execute(
+                "SELECT expires_at FROM counters WHERE key = ?", (key,)
+            ).fetchone()
+            return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            with self._lock:
+                self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+            with self._connection() as conn:
+                return conn.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key):
+        with self._lock:
+            self._windows.pop(key, None)
+            with self._connection() as conn:
+                conn.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def _sync(self, now, key):
+        """Write every pending hit in one transaction and refresh ``key``'s shared count."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for pending_key, window in self._windows.items():
+                if pending_key != key:
+                    if window.expires_at <= now:
+                        window.pending = 0  # its window is over; don't start the next with them
+                    if not window.pending:
+                        continue
+                window.count, window.expires_at = conn.execute(_UPSERT, {
+                    "key": pending_key,
+                    "amount": window.pending,
+                    "expires_at": now + window.expiry,
+                    "now": now,
+                }).fetchone()
+                window.pending = 0
+                window.synced = time.monotonic()
+            if now - self._last_purge >= _PURGE_INTERVAL:
+                conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+                self._last_purge = now
+                # Forget local views of windows that are over
+                for stale in [k for k, w in self._windows.items() if w.expires_at <= now]:
+                    del self._windows[stale]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connection(self):
+        # Gunicorn forks workers; a connection must not cross a fork
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Counters are disposable: losing the last writes on power loss is fine
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+            self._windows.clear()
+        return self._conn
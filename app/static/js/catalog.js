@@ -1,6 +1,7 @@
 document.addEventListener("DOMContentLoaded", () => {
     const grid = document.getElementById("softwareGrid");
     const searchInput = document.getElementById("searchInput");
+    const suggestionsEl = document.getElementById("searchSuggestions");
     const catalogCount = document.getElementById("catalogCount");
     const activeFiltersEl = document.getElementById("activeFilters");
     const clearFiltersBtn = document.getElementById("clearFilters");
@@ -10,7 +11,15 @@ document.addEventListener("DOMContentLoaded", () => {
     const checkboxes = document.querySelectorAll('.filter-option input[type="checkbox"]');
 
     let allSoftware = [];
+    let softwareById = new Map();
     let debounceTimer = null;
+    // Server-ranked ids for the current search (typo-tolerant), or null to filter locally
+    let searchResultIds = null;
+    let searchSeq = 0;
+    let suggestTimer = null;
+    let suggestSeq = 0;
+    let suggestions = [];
+    let activeSuggestion = -1;
 
     // Badge priority for card display (show these types on cards)
     const CARD_BADGE_TYPES = ["dpa_status", "cost", "roster", "access"];
@@ -21,13 +30,33 @@ document.addEventListener("DOMContentLoaded", () => {
     // Event listeners
     searchInput.addEventListener("input", () => {
         clearTimeout(debounceTimer);
-        debounceTimer = setTimeout(filterAndRender, 250);
+        debounceTimer = setTimeout(runSearch, 250);
+        clearTimeout(suggestTimer);
+        suggestTimer = setTimeout(fetchSuggestions, 80);
     });
 
+    searchInput.addEventListener("keydown", e => {
+        if (suggestionsEl.hidden) return;
+        if (e.key === "ArrowDown" || e.key === "ArrowUp") {
+            e.preventDefault();
+            const step = e.key === "ArrowDown" ? 1 : -1;
+            activeSuggestion = (activeSuggestion + step + suggestions.length) % suggestions.length;
+            highlightSuggestion();
+        } else if (e.key === "Enter" && activeSuggestion >= 0) {
+            e.preventDefault();
+            chooseSuggestion(suggestions[activeSuggestion]);
+        } else if (e.key === "Escape") {
+            hideSuggestions();
+        }
+    });
+
+    searchInput.addEventListener("blur", hideSuggestions);
+
     checkboxes.forEach(cb => cb.addEventListener("change", filterAndRender));
 
     clearFiltersBtn.addEventListener("click", () => {
         searchInput.value = "";
+        searchResultIds = null;
         checkboxes.forEach(cb => (cb.checked = false));
         filterAndRender();
     });
@@ -40,12 +69,107 @@ document.addEventListener("DOMContentLoaded", () => {
             const resp = await fetch("/api/software");
             if (!resp.ok) throw new Error("Failed to load");
             allSoftware = await resp.json();
+            softwareById = new Map(allSoftware.map(s => [s.id, s]));
             filterAndRender();
         } catch (err) {
             grid.innerHTML = '<div class="no-results">Failed to load catalog. Please refresh.</div>';
         }
     }
 
+    async function runSearch() {
+        const query = searchInput.value.trim();
+        const seq = ++searchSeq;
+        searchResultIds = null;
+        if (query) {
+            // Ask the server so misspellings still match
+            try {
+                const resp = await fetch(`/api/software?q=${encodeURIComponent(query)}`);
+                if (resp.ok) {
+                    const results = await resp.json();
+                    if (seq !== searchSeq) return;
+                    searchResultIds = results.map(s => s.id);
+                }
+            } catch (err) {
+                // Network error: fall back to local substring filtering
+            }
+            if (seq !== searchSeq) return;
+        }
+        filterAndRender();
+    }
+
+    async function fetchSuggestions() {
+        const query = searchInput.value.trim();
+        const seq = ++suggestSeq;
+        if (!query) {
+            hideSuggestions();
+            return;
+        }
+        try {
+            const resp = await fetch(`/api/suggest?q=${encodeURIComponent(query)}`);
+            if (!resp.ok) return;
+            const items = await resp.json();
+            if (seq !== suggestSeq) return;
+            renderSuggestions(items);
+        } catch (err) {
+            hideSuggestions();
+        }
+    }
+
+    function renderSuggestions(items) {
+        suggestions = items;
+        activeSuggestion = -1;
+        if (items.length === 0) {
+            hideSuggestions();
+            return;
+        }
+
+        suggestionsEl.innerHTML = items.map((item, i) => {
+            const label = item.kind === "category"
+                ? `<span class="badge badge-${escapeHtml(item.type)}">${escapeHtml(item.name)}</span>`
+                : escapeHtml(item.name);
+            return `<li role="option" data-index="${i}">${label}</li>`;
+        }).join("");
+
+        suggestionsEl.querySelectorAll("li").forEach(li => {
+            // mousedown fires before the input's blur hides the list
+            li.addEventListener("mousedown", e => {
+                e.preventDefault();
+                chooseSuggestion(suggestions[parseInt(li.dataset.index)]);
+            });
+        });
+        suggestionsEl.hidden = false;
+        searchInput.setAttribute("aria-expanded", "true");
+    }
+
+    function highlightSuggestion() {
+        suggestionsEl.querySelectorAll("li").forEach((li, i) => {
+            li.classList.toggle("active", i === activeSuggestion);
+        });
+    }
+
+    function hideSuggestions() {
+        suggestSeq++;
+        suggestionsEl.hidden = true;
+        searchInput.setAttribute("aria-expanded", "false");
+    }
+
+    function chooseSuggestion(item) {
+        hideSuggestions();
+        if (item.kind === "software") {
+            window.location.href = `/software/${item.id}`;
+            return;
+        }
+
+        // Category: turn it into a filter instead of a text search
+        checkboxes.forEach(cb => {
+            if (parseInt(cb.value) === item.id) cb.checked = true;
+        });
+        clearTimeout(debounceTimer);
+        searchInput.value = "";
+        searchResultIds = null;
+        filterAndRender();
+    }
+
     function filterAndRender() {
         const query = searchInput.value.toLowerCase().trim();
         const selectedCats = new Set(
@@ -57,7 +181,9 @@ document.addEventListener("DOMContentLoaded", () => {
         let filtered = allSoftware;
 
         // Text search
-        if (query) {
+        if (query && searchResultIds) {
+            filtered = searchResultIds.map(id => softwareById.get(id)).filter(Boolean);
+        } else if (query) {
             filtered = filtered.filter(s =>
                 s.name.toLowerCase().includes(query) ||
                 s.tagline.toLowerCase().includes(query)
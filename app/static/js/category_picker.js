@@ -0,0 +1,101 @@
+document.addEventListener("DOMContentLoaded", () => {
+    const picker = document.querySelector(".category-picker");
+    if (!picker) return;
+
+    const searchUrl = picker.dataset.searchUrl;
+    const selectedEl = document.getElementById("selectedCategories");
+    const searchInput = document.getElementById("categorySearch");
+    const resultsEl = document.getElementById("categoryResults");
+    const moreBtn = document.getElementById("categoryMore");
+
+    let page = 1;
+    let searchSeq = 0;
+    let debounceTimer = null;
+
+    searchInput.addEventListener("input", () => {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(() => loadPage(1), 150);
+    });
+
+    // Enter in the search box would otherwise submit the form
+    searchInput.addEventListener("keydown", e => {
+        if (e.key === "Enter") e.preventDefault();
+    });
+
+    moreBtn.addEventListener("click", () => loadPage(page + 1));
+
+    selectedEl.addEventListener("click", e => {
+        const btn = e.target.closest(".category-remove");
+        if (!btn) return;
+        const chip = btn.closest(".category-chip");
+        chip.remove();
+        const box = resultsEl.querySelector(`input[value="${chip.dataset.id}"]`);
+        if (box) box.checked = false;
+    });
+
+    resultsEl.addEventListener("change", e => {
+        const box = e.target;
+        if (box.checked) {
+            addChip({ id: box.value, name: box.dataset.name, type: box.dataset.type });
+        } else {
+            const chip = selectedEl.querySelector(`.category-chip[data-id="${box.value}"]`);
+            if (chip) chip.remove();
+        }
+    });
+
+    async function loadPage(pageNo) {
+        const seq = ++searchSeq;
+        const params = new URLSearchParams({ q: searchInput.value.trim(), page: pageNo });
+        try {
+            const resp = await fetch(`${searchUrl}?${params}`);
+            if (!resp.ok) return;
+            const data = await resp.json();
+            if (seq !== searchSeq) return;
+            if (pageNo === 1) resultsEl.replaceChildren();
+            data.items.forEach(cat => resultsEl.appendChild(resultOption(cat)));
+            page = data.page;
+            moreBtn.hidden = !data.has_more;
+        } catch (err) {
+            // Leave the current results in place
+        }
+    }
+
+    function isSelected(id) {
+        return selectedEl.querySelector(`.category-chip[data-id="${id}"]`) !== null;
+    }
+
+    function resultOption(cat) {
+        const label = document.createElement("label");
+        const box = document.createElement("input");
+        box.type = "checkbox";
+        box.value = cat.id;
+        box.dataset.name = cat.name;
+        box.dataset.type = cat.type;
+        box.checked = isSelected(cat.id);
+        const badge = document.createElement("span");
+        badge.className = `badge badge-${cat.type}`;
+        badge.textContent = cat.name;
+        label.append(box, badge);
+        return label;
+    }
+
+    function addChip(cat) {
+        if (isSelected(cat.id)) return;
+        const chip = document.createElement("span");
+        chip.className = `badge badge-${cat.type} category-chip`;
+        chip.dataset.id = cat.id;
+        const hidden = document.createElement("input");
+        hidden.type = "hidden";
+        hidden.name = "categories";
+        hidden.value = cat.id;
+        const remove = document.createElement("button");
+        remove.type = "button";
+        remove.className = "category-remove";
+        remove.setAttribute("aria-label", `Remove ${cat.name}`);
+        remove.textContent = "×";
+        chip.append(cat.name, hidden, remove);
+        selectedEl.appendChild(chip);
+    }
+
+    loadPage(1);
+});
@@ -8,4 +8,8 @@ if [ ! -f /app/instance/catalog.db ]; then
     python seed.py
 fi
 
+# Publish the catalog if there is no snapshot yet or it changed (new templates
+# in this release, or a hand-edited database); otherwise the version is kept
+flask --app wsgi publish-catalog
+
 exec "$@"
@@ -0,0 +1,23 @@
+"""Gunicorn settings picked up automatically from the working directory.
+
+Worker and bind options stay on the command line in the Dockerfile; this file
+only wires up shared Prometheus metrics across workers.
+"""
+
+import os
+import shutil
+
+# Must be set before the workers import prometheus_client
+_metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/catalog-metrics")
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be summed into this one
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1 @@
+"""Performance tooling: query-plan checks and benchmarks against throwaway databases."""
@@ -0,0 +1,208 @@
+"""Benchmark the catalog routes against generated catalogs of several sizes.
+
+Each scenario is driven through the Flask test client, signed in as an admin,
+against a throwaway SQLite database. For every scenario the benchmark records
+latency percentiles, SQL statements per request and peak Python memory, and
+writes everything to a JSON file so runs can be compared.
+
+Usage:
+    python -m perf.bench --sizes 1000,10000 --output bench-before.json
+    python -m perf.bench --sizes 1000,10000 --output bench-after.json --compare bench-before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app import db
+from app.catalog.results import get_result_cache
+from perf.harness import (
+    capture_sql, create_admin, load_catalog, login_client, percentile, run_metadata,
+    synthetic_catalog, temporary_app,
+)
+
+_CONFIG = {"WTF_CSRF_ENABLED": False}
+
+
+def _summarize(latencies, queries, peak_bytes):
+    ms = [t * 1000 for t in latencies]
+    return {
+        "samples": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+        "queries_per_request": round(statistics.fmean(queries), 1),
+        "peak_memory_kb": round(peak_bytes / 1024, 1),
+    }
+
+
+def _measure(run, engine, iterations, max_seconds):
+    """Time ``run`` repeatedly, then repeat once under tracemalloc for peak memory."""
+    latencies = []
+    queries = []
+    deadline = time.perf_counter() + max_seconds
+    for i in range(iterations):
+        with capture_sql(engine) as statements:
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(statements))
+        if i >= 2 and time.perf_counter() > deadline:
+            break
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return _summarize(latencies, queries, peak)
+
+
+def _get(client, path):
+    def run():
+        resp = client.get(path)
+        assert resp.status_code == 200, f"GET {path} returned {resp.status_code}"
+        resp.get_data()
+    return run
+
+
+def bench_size(size, iterations, max_seconds, scenarios=None):
+    """Run every scenario against a fresh catalog of ``size`` entries."""
+    entries = synthetic_catalog(size)
+    results = {}
+    with temporary_app(_CONFIG) as app:
+        with app.app_context():
+            category_ids = load_catalog(entries)
+            user_id = create_admin()
+            engine = db.engine
+
+        # Requests run outside the setup context, so each gets its own app
+        # context and g, as in production (load_user runs on every request)
+        client = login_client(app, user_id)
+        cat1 = category_ids["DPA Active"]
+        cat2 = category_ids["Free Application"]
+        rng = random.Random(size)
+
+        def detail():
+            software_id = rng.randint(1, size)
+            resp = client.get(f"/software/{software_id}")
+            assert resp.status_code == 200, f"detail returned {resp.status_code}"
+
+        def uncached(run):
+            def cold():
+                with app.app_context():
+                    get_result_cache().clear()
+                run()
+            return cold
+
+        # Merge an upload that is half duplicates, half new entries
+        import_payload = json.dumps(
+            entries[:50] + synthetic_catalog(50, seed=size + 1)
+        ).encode()
+
+        def import_backup():
+            resp = client.post("/admin/import", data={
+                "import_mode": "merge",
+                "backup_file": (io.BytesIO(import_payload), "backup.json"),
+            })
+            assert resp.status_code == 302, f"import returned {resp.status_code}"
+
+        fd, seed_path = tempfile.mkstemp(prefix="catalog-seed-", suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+
+        def run_seed():
+            from seed import seed
+            with contextlib.redirect_stdout(io.StringIO()):
+                seed(app, seed_path)
+
+        plan = [
+            ("api_software", _get(client, "/api/software")),
+            ("api_software search", _get(client, "/api/software?q=class")),
+            ("api_software multi-category", _get(client, f"/api/software?cat={cat1}&cat={cat2}")),
+            # The scenarios above are served from the result cache after the first run
+            ("api_software search uncached", uncached(_get(client, "/api/software?q=class"))),
+            # Typeahead budget: p99 under 5 ms
+            ("api_suggest", _get(client, "/api/suggest?q=cla")),
+            ("catalog.detail", detail),
+            ("admin.dashboard", _get(client, "/admin/")),
+            ("admin.export_backup", _get(client, "/admin/export")),
+            ("admin.import_backup", import_backup),
+            # Seed resets the database, so it always runs last
+            ("seed", run_seed),
+        ]
+
+        try:
+            for name, run in plan:
+                if scenarios and name not in scenarios:
+                    continue
+                print(f"  {size:>7} entries  {name:<30}", end="", flush=True)
+                results[name] = _measure(run, engine, iterations, max_seconds)
+                # Admin writes rebuild the snapshot in the background; don't bill the next scenario
+                app.extensions["snapshot_builder"].wait()
+                r = results[name]
+                print(f" p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+                      f"{r['queries_per_request']:>8.1f} queries  {r['peak_memory_kb']:>9.0f} KB")
+        finally:
+            os.remove(seed_path)
+
+    return results
+
+
+def compare(baseline, current):
+    """Print p50/p99 changes between two result files."""
+    print("\nChange vs baseline (negative is faster):")
+    for size, scenarios in current["results"].items():
+        for name, r in scenarios.items():
+            old = baseline["results"].get(size, {}).get(name)
+            if not old:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p99_ms"):
+                if old[key]:
+                    deltas.append(f"{key[:3]} {(r[key] - old[key]) / old[key] * 100:+7.1f}%")
+            print(f"  {size:>7} entries  {name:<30} {'  '.join(deltas)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated catalog sizes (default: 1000,10000,100000)")
+    parser.add_argument("--iterations", type=int, default=30, help="requests per scenario")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="stop a scenario early once this much time has passed (min 3 samples)")
+    parser.add_argument("--scenario", action="append", dest="scenarios",
+                        help="only run the named scenario (repeatable)")
+    parser.add_argument("--output", default="bench-results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    report = {"meta": run_metadata(), "results": {}}
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        report["results"][str(size)] = bench_size(
+            size, args.iterations, args.max_seconds, args.scenarios
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Shared helpers for driving the app against a throwaway SQLite database.
+
+Nothing here touches the configured database: every harness app points at a
+temporary file and is seeded with generated data. ``temporary_app`` deletes
+the database and instance directory when it exits.
+"""
+
+import os
+import platform
+import random
+import secrets
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.catalog.search import warm_indexes
+from app.catalog.snapshot import rebuild_snapshot
+from app.models import Category, Software, User, software_categories
+
+# Category pools modelled on software_directory.json
+DPA_CATEGORIES = [
+    ("DPA Active", 0.55),
+    ("DPA Pending", 0.2),
+    ("1-Approved", 0.1),
+    ("3-Denied", 0.05),
+    ("4-Not Required", 0.1),
+]
+COST_CATEGORIES = [
+    ("Free Application", 0.45),
+    ("Paid by District", 0.3),
+    ("Paid by School", 0.2),
+    ("Paid by Individuals", 0.05),
+]
+ROSTER_CATEGORIES = ["Clever", "ClassLink", "Roster: Manual", "Roster: SIS Sync"]
+ACCESS_CATEGORIES = ["Staff Only", "Account-Required", "No Account Required", "Parental-Consent"]
+SUBJECT_CATEGORIES = [
+    "Math", "ELA", "Science", "Social Studies", "Art", "Music", "World Languages",
+    "PE", "CTE", "Special Education", "ELL", "Library", "Instructional", "LMS",
+    "assessment", "Productivity", "Communication", "Coding", "Reading",
+    "Writing", "Video", "Presentation", "Collaboration", "Research",
+]
+
+_WORDS = [
+    "Google", "Class", "Room", "Quick", "Assess", "Math", "Read", "Write", "Code",
+    "Learn", "Quiz", "Board", "Note", "Book", "Study", "Lab", "Sketch", "Story",
+    "Map", "Flash", "Card", "Pad", "Hub", "Spark", "Press", "Cast", "Deck",
+]
+
+
+def synthetic_catalog(size, seed=0):
+    """Generate ``size`` entries in the software_directory.json format."""
+    rng = random.Random(seed)
+    dpa_names, dpa_weights = zip(*DPA_CATEGORIES)
+    cost_names, cost_weights = zip(*COST_CATEGORIES)
+    entries = []
+    for i in range(size):
+        name = f"{rng.choice(_WORDS)}{rng.choice(_WORDS)} {i}"
+        categories = [
+            rng.choices(dpa_names, dpa_weights)[0],
+            rng.choices(cost_names, cost_weights)[0],
+        ]
+        categories += rng.sample(ROSTER_CATEGORIES, rng.randint(0, 2))
+        if rng.random() < 0.3:
+            categories.append(rng.choice(ACCESS_CATEGORIES))
+        categories += rng.sample(SUBJECT_CATEGORIES, rng.randint(1, 3))
+        entries.append({
+            "name": name,
+            "url": f"https://www.example-{i}.com",
+            "tagline": f"A {rng.choice(_WORDS).lower()} tool for {rng.choice(SUBJECT_CATEGORIES).lower()} classrooms.",
+            "content": " ".join(rng.choices(_WORDS, k=rng.randint(20, 400))),
+            "logo": "",
+            "featured": rng.random() < 0.05,
+            "categories": categories,
+        })
+    return entries
+
+
+def make_app(db_path, instance_path, config=None):
+    """Create an app bound to the given database file and instance directory."""
+    overrides = {
+        "SECRET_KEY": secrets.token_hex(32),
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "RATELIMIT_ENABLED": False,
+        # Keep harness runs out of the project's logs/
+        "LOG_DIR": os.path.join(instance_path, "logs"),
+    }
+    overrides.update(config or {})
+    return create_app(overrides, instance_path=instance_path)
+
+
+@contextmanager
+def temporary_app(config=None):
+    """Yield an app on a throwaway database and instance directory, removed afterwards."""
+    workdir = tempfile.mkdtemp(prefix="catalog-perf-")
+    try:
+        app = make_app(
+            os.path.join(workdir, "catalog.db"), os.path.join(workdir, "instance"), config
+        )
+        try:
+            yield app
+        finally:
+            app.extensions["snapshot_builder"].wait()
+            with app.app_context():
+                db.engine.dispose()
+            # Apps share one logger; drop this app's handler on the deleted log file
+            for handler in list(app.logger.handlers):
+                if getattr(handler, "baseFilename", "").startswith(workdir):
+                    app.logger.removeHandler(handler)
+                    handler.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def load_catalog(entries):
+    """Bulk-insert catalog entries with Core statements (much faster than the ORM)."""
+    category_ids = {}
+    for entry in entries:
+        for cat_name in entry["categories"]:
+            category_ids.setdefault(cat_name, len(category_ids) + 1)
+    db.session.execute(db.insert(Category), [
+        {"id": cid, "name": name, "category_type": Category.classify(name)}
+        for name, cid in category_ids.items()
+    ])
+    db.session.execute(db.insert(Software), [
+        {
+            "id": i,
+            "name": e["name"],
+            "url": e["url"],
+            "tagline": e["tagline"],
+            "content": e["content"],
+            "logo": e["logo"],
+            "featured": e["featured"],
+        }
+        for i, e in enumerate(entries, start=1)
+    ])
+    db.session.execute(db.insert(software_categories), [
+        {"software_id": i, "category_id": category_ids[name]}
+        for i, e in enumerate(entries, start=1)
+        for name in dict.fromkeys(e["categories"])
+    ])
+    db.session.commit()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    rebuild_snapshot()
+    warm_indexes()
+    return category_ids
+
+
+def create_admin():
+    """Create the admin user the harness signs in as."""
+    user = User(email="perf-admin@example.org", name="Perf Admin", is_admin=True)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def login_client(app, user_id):
+    """Return a test client whose session is already signed in as ``user_id``."""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+    return client
+
+
+@contextmanager
+def capture_sql(engine):
+    """Record every (statement, parameters) pair executed on ``engine``."""
+    statements = []
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _before)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _before)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_metadata():
+    """Where and when a result file was produced, so runs can be compared."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
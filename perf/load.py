@@ -0,0 +1,389 @@
+"""Load-test the catalog under gunicorn with simulated school-day traffic.
+
+Starts the app locally (``perf.load_wsgi``, a throwaway catalog with a
+header-based login bypass) once per worker/thread setting, then drives it
+with hundreds of concurrent virtual users following the request mix of
+catalog.js: open the catalog (page plus the full /api/software fetch), type
+searches (a /api/suggest call per keystroke, then /api/software?q=), filter
+by category, open detail pages. A few virtual admins also edit entries and
+merge imports. Throughput, latency percentiles and error rates are reported
+per route, and written to JSON, for every setting.
+
+The generator runs on the same machine as the server, spread over several
+processes so the client side is not GIL-bound; leave it some CPU (or lower
+``--client-processes``) when reading absolute numbers.
+
+Usage:
+    python -m perf.load --workers 2,4 --threads 1,4 --users 100,300 --duration 60
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from app import db
+from app.models import User
+from perf.harness import create_admin, load_catalog, make_app, percentile, run_metadata, synthetic_catalog
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TIMEOUT = 30
+_STARTUP_TIMEOUT = 60
+
+# Relative weights of what a virtual user does between pauses
+_USER_MIX = {"search": 40, "detail": 35, "filter": 10, "reload": 15}
+_ADMIN_MIX = {"search": 15, "detail": 25, "edit": 50, "import_backup": 10}
+
+
+def prepare(size, workdir):
+    """Create the database and instance directory the server will use."""
+    db_path = os.path.join(workdir, "load.db")
+    instance_path = os.path.join(workdir, "instance")
+    secret_key = secrets.token_hex(32)
+    app = make_app(
+        db_path,
+        instance_path,
+        config={"SECRET_KEY": secret_key, "LOGO_CACHE_ENABLED": False},
+    )
+    entries = synthetic_catalog(size)
+    with app.app_context():
+        category_ids = load_catalog(entries)
+        admin_id = create_admin()
+        user = User(email="perf-user@example.org", name="Perf User")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        db.engine.dispose()
+
+    words = sorted({w.lower() for e in entries for w in e["name"].split() if w.isalpha()})
+    catalog = {
+        "entries": [
+            {
+                "id": i,
+                "name": e["name"],
+                "tagline": e["tagline"],
+                "categories": sorted({category_ids[c] for c in e["categories"]}),
+            }
+            for i, e in enumerate(entries, start=1)
+        ],
+        "category_ids": sorted(category_ids.values()),
+        # Correct spellings plus some with a dropped letter, for the fuzzy path
+        "search_terms": words + [w[:2] + w[3:] for w in words if len(w) > 4],
+    }
+    env = {
+        "LOAD_TEST_DB": db_path,
+        "LOAD_TEST_INSTANCE": instance_path,
+        "LOAD_TEST_SECRET_KEY": secret_key,
+        "LOAD_TEST_TOKEN": secrets.token_hex(16),
+    }
+    return env, catalog, user_id, admin_id
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def running_server(env, workers, threads, log_path):
+    """Run gunicorn with the load-test app; yields its base URL."""
+    port = _free_port()
+    server_env = dict(os.environ, **env)
+    server_env["PYTHONPATH"] = os.pathsep.join(filter(None, [_ROOT, os.environ.get("PYTHONPATH")]))
+    # Keep gunicorn.conf.py from clearing a real deployment's metrics directory
+    server_env["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(os.path.dirname(env["LOAD_TEST_DB"]), "metrics")
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+             "--workers", str(workers), "--threads", str(threads), "perf.load_wsgi:app"],
+            cwd=_ROOT, env=server_env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_ready(base_url, process, log_path)
+        yield base_url
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _wait_until_ready(base_url, process, log_path):
+    deadline = time.monotonic() + _STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}; see {log_path}")
+        try:
+            if requests.get(f"{base_url}/login", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not start within {_STARTUP_TIMEOUT}s; see {log_path}")
+
+
+class VirtualUser:
+    """One simulated browser session, recording ``(route, start, seconds, status, expected)``.
+
+    A status of 0 means the request failed without a response (refused, reset
+    or timed out).
+    """
+
+    def __init__(self, base_url, auth_header, catalog, is_admin, think_time, seed, record):
+        self._base_url = base_url
+        self._catalog = catalog
+        self._is_admin = is_admin
+        self._think_time = think_time
+        self._rng = random.Random(seed)
+        self._record = record
+        self._session = requests.Session()
+        # Like browsers, retry idempotent requests once when the server closed
+        # an idle keep-alive connection just as it was reused
+        self._session.mount("http://", HTTPAdapter(max_retries=Retry(total=1, redirect=False)))
+        self._session.headers["X-Load-Test-User"] = auth_header
+        self._imports = 0
+
+    def run(self, start_at, until):
+        time.sleep(max(0.0, start_at - time.time()))
+        mix = _ADMIN_MIX if self._is_admin else _USER_MIX
+        actions, weights = zip(*mix.items())
+        self.reload()
+        while time.time() < until:
+            self._pause(self._think_time)
+            getattr(self, self._rng.choices(actions, weights)[0])()
+
+    def _pause(self, mean):
+        if mean:
+            time.sleep(self._rng.uniform(0.5 * mean, 1.5 * mean))
+
+    def _call(self, route, method, path, expect=200, **kwargs):
+        start = time.time()
+        try:
+            response = self._session.request(
+                method, self._base_url + path, timeout=_TIMEOUT, allow_redirects=False, **kwargs
+            )
+            response.content
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        self._record((route, start, time.time() - start, status, expect))
+
+    def reload(self):
+        self._call("GET /", "GET", "/")
+        self._call("GET /api/software", "GET", "/api/software")
+
+    def search(self):
+        term = self._rng.choice(self._catalog["search_terms"])
+        # catalog.js asks for suggestions on (nearly) every keystroke...
+        for end in range(1, len(term) + 1):
+            self._call("GET /api/suggest", "GET", "/api/suggest", params={"q": term[:end]})
+            self._pause(min(0.15, self._think_time / 10))
+        # ...and searches once typing pauses
+        self._call("GET /api/software?q=", "GET", "/api/software", params={"q": term})
+
+    def filter(self):
+        # catalog.js filters client-side; this is the server-side filter API
+        cats = self._rng.sample(self._catalog["category_ids"], self._rng.randint(1, 3))
+        self._call("GET /api/software?cat=", "GET", "/api/software", params={"cat": cats})
+
+    def detail(self):
+        entry = self._rng.choice(self._catalog["entries"])
+        self._call("GET /software/<id>", "GET", f"/software/{entry['id']}")
+
+    def edit(self):
+        entry = self._rng.choice(self._catalog["entries"])
+        path = f"/admin/edit/{entry['id']}"
+        self._call("GET /admin/edit/<id>", "GET", path)
+        self._pause(self._think_time)
+        self._call("POST /admin/edit/<id>", "POST", path, expect=302, data={
+            "name": entry["name"],
+            "url": f"https://www.example-{entry['id']}.com",
+            "tagline": f"{entry['tagline']} (edited {self._rng.randint(1, 10**6)})",
+            "content": "Edited during a load test.",
+            "logo": "",
+            "categories": entry["categories"],
+        })
+
+    def import_backup(self):
+        # Merge a small upload: a few existing names and a few new ones
+        self._imports += 1
+        existing = self._rng.sample(self._catalog["entries"], 5)
+        new = synthetic_catalog(5, seed=self._rng.randint(1, 10**9))
+        for i, e in enumerate(new):
+            e["name"] = f"Load Import {id(self)}-{self._imports}-{i}"
+        payload = [
+            {"name": e["name"], "tagline": e["tagline"], "categories": ["DPA Active"]} for e in existing
+        ] + new
+        upload = ("backup.json", io.BytesIO(json.dumps(payload).encode()), "application/json")
+        self._call("POST /admin/import", "POST", "/admin/import", expect=302,
+                   data={"import_mode": "merge"}, files={"backup_file": upload})
+
+
+def _run_client_process(base_url, users, catalog, think_time, start_at, ramp, until):
+    """Run a share of the virtual users as threads; returns their samples."""
+    samples = []
+    threads = []
+    for n, (auth_header, is_admin, seed, offset) in enumerate(users):
+        user = VirtualUser(base_url, auth_header, catalog, is_admin, think_time, seed, samples.append)
+        thread = threading.Thread(target=user.run, args=(start_at + ramp * offset, until), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, start, end):
+    """Per-route and overall figures for requests started within ``[start, end)``."""
+    window = end - start
+    by_route = {}
+    for route, started, seconds, status, expected in samples:
+        if start <= started < end:
+            by_route.setdefault(route, []).append((seconds * 1000, status, expected))
+
+    def figures(results):
+        ms = [m for m, _, _ in results]
+        # Anything but the expected status (200, or 302 after a form post) is an error
+        error_statuses = Counter(str(status) for _, status, expected in results if status != expected)
+        errors = sum(error_statuses.values())
+        return {
+            "requests": len(results),
+            "rps": round(len(results) / window, 2),
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p90_ms": round(percentile(ms, 90), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "max_ms": round(max(ms), 2),
+            "errors": errors,
+            "error_rate": round(errors / len(results), 4),
+            "error_statuses": dict(error_statuses),
+        }
+
+    routes = {route: figures(results) for route, results in sorted(by_route.items())}
+    everything = [r for results in by_route.values() for r in results]
+    return {"all": figures(everything) if everything else None, "routes": routes}
+
+
+def run_load(base_url, env, catalog, user_id, admin_id, users, admins, processes,
+             think_time, ramp, duration):
+    """Drive ``users`` virtual users (``admins`` of them admins) for ``ramp + duration`` seconds."""
+    token = env["LOAD_TEST_TOKEN"]
+    plan = [
+        (f"{token}:{admin_id if n < admins else user_id}", n < admins, n, n / users)
+        for n in range(users)
+    ]
+    start_at = time.time() + 1
+    measure_from = start_at + ramp
+    until = measure_from + duration
+
+    samples = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(_run_client_process, base_url, plan[i::processes], catalog,
+                        think_time, start_at, ramp, until)
+            for i in range(processes)
+        ]
+        for future in futures:
+            samples.extend(future.result())
+    # Only requests started after every user has ramped up count
+    return summarize(samples, measure_from, until)
+
+
+def _print_result(label, result):
+    overall = result["all"]
+    if overall is None:
+        print(f"{label}: no requests completed")
+        return
+    print(f"{label}: {overall['rps']:.1f} req/s, p50 {overall['p50_ms']:.1f} ms, "
+          f"p99 {overall['p99_ms']:.1f} ms, {overall['error_rate']:.2%} errors")
+    print(f"    {'route':<26} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'errors':>8}")
+    for route, r in result["routes"].items():
+        # Status 0 means no response at all
+        statuses = " ".join(f"{status}x{n}" for status, n in sorted(r["error_statuses"].items()))
+        print(f"    {route:<26} {r['requests']:>9} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['error_rate']:>8.2%}  {statuses}".rstrip())
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=_int_list, default=[2],
+                        help="comma-separated gunicorn --workers settings (default: 2)")
+    parser.add_argument("--threads", type=_int_list, default=[4],
+                        help="comma-separated gunicorn --threads settings (default: 4)")
+    parser.add_argument("--users", type=_int_list, default=[200],
+                        help="comma-separated numbers of concurrent virtual users (default: 200)")
+    parser.add_argument("--admins", type=int, default=2, help="how many of the users are admins (default: 2)")
+    parser.add_argument("--size", type=int, default=2000, help="catalog entries (default: 2000)")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds per run (default: 60)")
+    parser.add_argument("--ramp", type=float, default=10.0,
+                        help="seconds over which users start, not measured (default: 10)")
+    parser.add_argument("--think-time", type=float, default=3.0,
+                        help="mean pause between user actions in seconds; 0 for a stress test (default: 3)")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="processes generating load (default: half the CPUs)")
+    parser.add_argument("--output", default="load-results.json", help="where to write the JSON results")
+    parser.add_argument("--server-log", default="load-gunicorn.log", help="where gunicorn's output goes")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="catalog-load-")
+    log_path = os.path.abspath(args.server_log)
+    report = {"meta": run_metadata(), "settings": vars(args), "runs": []}
+    try:
+        env, catalog, user_id, admin_id = prepare(args.size, workdir)
+        for workers in args.workers:
+            for threads in args.threads:
+                with running_server(env, workers, threads, log_path) as base_url:
+                    for users in args.users:
+                        label = f"workers={workers} threads={threads} users={users}"
+                        print(f"{label}: running for {args.ramp + args.duration:.0f}s...", flush=True)
+                        result = run_load(
+                            base_url, env, catalog, user_id, admin_id, users,
+                            min(args.admins, users), args.client_processes,
+                            args.think_time, args.ramp, args.duration,
+                        )
+                        _print_result(label, result)
+                        report["runs"].append(
+                            {"workers": workers, "threads": threads, "users": users, **result}
+                        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'workers':>7} {'threads':>7} {'users':>6} {'req/s':>8} {'p99 ms':>9} {'errors':>8}")
+    for run in report["runs"]:
+        overall = run["all"] or {"rps": 0, "p99_ms": 0, "error_rate": 0}
+        print(f"{run['workers']:>7} {run['threads']:>7} {run['users']:>6} {overall['rps']:>8.1f} "
+              f"{overall['p99_ms']:>9.1f} {overall['error_rate']:>8.2%}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
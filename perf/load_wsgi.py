@@ -0,0 +1,34 @@
+"""WSGI entry point that ``perf.load`` runs under gunicorn. Never deploy this.
+
+It serves the throwaway database and instance directory prepared by
+perf.load, with CSRF disabled and one extra way to sign in: a request
+carrying ``X-Load-Test-User: <token>:<user id>`` is treated as that user,
+where the token is a random secret perf.load passes in the environment.
+"""
+
+import hmac
+import os
+
+from app import db, login_manager
+from app.models import User
+from perf.harness import make_app
+
+_TOKEN = os.environ["LOAD_TEST_TOKEN"]
+
+app = make_app(
+    os.environ["LOAD_TEST_DB"],
+    os.environ["LOAD_TEST_INSTANCE"],
+    config={
+        "SECRET_KEY": os.environ["LOAD_TEST_SECRET_KEY"],
+        "WTF_CSRF_ENABLED": False,
+        "LOGO_CACHE_ENABLED": False,
+    },
+)
+
+
+@login_manager.request_loader
+def _load_test_user(request):
+    token, _, user_id = request.headers.get("X-Load-Test-User", "").partition(":")
+    if not user_id.isdigit() or not hmac.compare_digest(token, _TOKEN):
+        return None
+    return db.session.get(User, int(user_id))
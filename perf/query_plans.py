@@ -0,0 +1,116 @@
+"""Query-plan regression check for the hot catalog queries.
+
+Drives the hot routes through the Flask test client against a generated
+catalog, captures every SQL statement they run and fails if SQLite plans a
+full table scan or a temporary sort for any of them.
+
+Usage:
+    python -m perf.query_plans [--size 2000]
+
+Exits non-zero when a regression is found, so it can gate a deployment.
+"""
+
+import argparse
+import re
+import sys
+
+from app import db
+from perf.harness import (
+    capture_sql, create_admin, load_catalog, login_client, synthetic_catalog, temporary_app,
+)
+
+# (label, path, tables the route may scan in full); every request also
+# exercises load_user
+HOT_ROUTES = [
+    ("api_software", "/api/software", set()),
+    ("api_software search", "/api/software?q=class", set()),
+    ("api_software search category", "/api/software?q=class&cat={cat1}", set()),
+    ("api_software category", "/api/software?cat={cat1}", set()),
+    ("api_software multi-category", "/api/software?cat={cat1}&cat={cat2}", set()),
+    # Both list every entry by design
+    ("dashboard", "/admin/", {"software"}),
+    ("export_backup", "/admin/export", {"software"}),
+]
+
+# Any SCAN visits every row; walking an index ("SCAN software USING INDEX
+# ix_...") only changes the order. Constrained lookups are planned as SEARCH.
+# Older SQLite says "SCAN TABLE".
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+_TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+def explain(engine, statement, parameters):
+    """Return the EXPLAIN QUERY PLAN detail lines for one statement."""
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+def plan_problems(plan, allowed_scans=()):
+    """Return the plan lines that indicate a full scan or an unindexed sort."""
+    problems = []
+    for line in plan:
+        scan = _FULL_SCAN.match(line.strip())
+        if (scan and scan.group(1) not in allowed_scans) or _TEMP_SORT in line:
+            problems.append(line)
+    return problems
+
+
+def check(size=2000):
+    failures = []
+    with temporary_app() as app:
+        with app.app_context():
+            category_ids = load_catalog(synthetic_catalog(size))
+            user_id = create_admin()
+            engine = db.engine
+
+        # Requests run outside the setup context, so each gets a fresh g and
+        # load_user runs every time, as in production
+        client = login_client(app, user_id)
+        cat1 = category_ids["DPA Active"]
+        cat2 = category_ids["Free Application"]
+
+        for label, path, allowed_scans in HOT_ROUTES:
+            path = path.format(cat1=cat1, cat2=cat2)
+            with capture_sql(engine) as statements:
+                resp = client.get(path)
+            if resp.status_code != 200:
+                failures.append((label, f"HTTP {resp.status_code}", []))
+                continue
+
+            seen = set()
+            failed = False
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith("SELECT") or statement in seen:
+                    continue
+                seen.add(statement)
+                plan = explain(engine, statement, parameters)
+                problems = plan_problems(plan, allowed_scans)
+                if problems:
+                    failures.append((label, statement, problems))
+                    failed = True
+            print(f"  {'FAIL' if failed else 'ok':<4}  {label:<30} {len(seen)} distinct queries")
+
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="number of generated entries")
+    args = parser.parse_args(argv)
+
+    print(f"Checking query plans against {args.size} generated entries...")
+    failures = check(args.size)
+    for label, statement, problems in failures:
+        print(f"\n[{label}] {statement}")
+        for line in problems:
+            print(f"    -> {line}")
+    if failures:
+        print(f"\n{len(failures)} query plan regression(s) found.")
+        return 1
+    print("No full scans found.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Regression check for the shared rate-limit storage (app.ratelimit).
+
+Replays the same hit sequences against ``memory://`` and against the
+sqlitewal storage, both batched (the default sync interval) and writing
+every hit through, and fails if any allow/deny verdict differs. It also
+checks that hits from several processes add up in the shared counters.
+
+Usage:
+    python -m perf.ratelimit_check
+
+Exits non-zero when a regression is found. Takes a few seconds, most of it
+waiting for one-second windows to roll over.
+"""
+
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+
+from limits import parse, storage, strategies
+
+import app.ratelimit  # noqa: F401  registers the sqlitewal:// scheme
+
+_WORKERS = 4
+_HITS_PER_WORKER = 500
+
+
+def _limiter(uri):
+    return strategies.FixedWindowRateLimiter(storage.storage_from_string(uri))
+
+
+def _rollover(limiter):
+    """Hits over the limit must not count against the next window."""
+    item = parse("2/second")
+    for _ in range(4):
+        limiter.hit(item, "rollover")
+    time.sleep(1.1)
+    return [limiter.hit(item, "rollover") for _ in range(3)]
+
+
+def _rollover_other_key(limiter):
+    """Same, when another key's hit is what syncs the stale pending hits."""
+    item = parse("2/second")
+    for _ in range(4):
+        limiter.hit(item, "stale")
+    time.sleep(1.1)
+    limiter.hit(item, "other")
+    return [limiter.hit(item, "stale") for _ in range(3)]
+
+
+def _burst(limiter):
+    item = parse("3/second")
+    return [limiter.hit(item, "burst") for _ in range(5)]
+
+
+SCENARIOS = [
+    ("window rollover", _rollover),
+    ("rollover synced by another key", _rollover_other_key),
+    ("burst within one window", _burst),
+]
+
+
+def _hammer(uri):
+    limiter = _limiter(uri)
+    item = parse("1000000/hour")
+    for _ in range(_HITS_PER_WORKER):
+        limiter.hit(item, "shared")
+    # The last batch is written by the next hit after the sync interval
+    time.sleep(0.1)
+    limiter.hit(item, "shared")
+
+
+def check():
+    workdir = tempfile.mkdtemp(prefix="catalog-ratelimit-")
+    failures = []
+    try:
+        backends = {
+            "batched": f"sqlitewal://{workdir}/batched.db",
+            "write-through": f"sqlitewal://{workdir}/through.db?sync_interval=0",
+        }
+        for label, scenario in SCENARIOS:
+            expected = scenario(_limiter("memory://"))
+            for backend, uri in backends.items():
+                got = scenario(_limiter(uri))
+                ok = got == expected
+                if not ok:
+                    failures.append((f"{label} ({backend})", f"expected {expected}, got {got}"))
+                print(f"  {'ok' if ok else 'FAIL':<4}  {label:<32} {backend}")
+
+        uri = f"sqlitewal://{workdir}/shared.db"
+        processes = [
+            multiprocessing.Process(target=_hammer, args=(uri,)) for _ in range(_WORKERS)
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        count = storage.storage_from_string(uri).get("LIMITER/shared/1000000/1/hour")
+        expected_count = _WORKERS * (_HITS_PER_WORKER + 1)
+        ok = count == expected_count
+        if not ok:
+            failures.append(("shared count", f"expected {expected_count}, got {count}"))
+        print(f"  {'ok' if ok else 'FAIL':<4}  {'hits from ' + str(_WORKERS) + ' processes':<32} {count} counted")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return failures
+
+
+def main():
+    print("Checking rate-limit storage against memory://...")
+    failures = check()
+    for label, problem in failures:
+        print(f"\n[{label}] {problem}")
+    if failures:
+        print(f"\n{len(failures)} rate-limit regression(s) found.")
+        return 1
+    print("Rate-limit storage matches memory://.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
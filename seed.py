@@ -4,13 +4,15 @@ import json
 import sys
 
 from app import create_app, db
+from app.catalog.snapshot import rebuild_snapshot
 from app.models import Category, Software
 
 
-def seed():
-    app = create_app()
+def seed(app=None, path="software_directory.json"):
+    if app is None:
+        app = create_app()
 
-    with open("software_directory.json", "r") as f:
+    with open(path, "r") as f:
         entries = json.load(f)
 
     with app.app_context():
@@ -53,6 +55,7 @@ def seed():
                 software.categories.append(category)
 
         db.session.commit()
+        rebuild_snapshot()
 
         software_count = Software.query.count()
         category_count = Category.query.count()
@@ -60,4 +63,4 @@ def seed():
 
 
 if __name__ == "__main__":
-    seed()
+    seed(path=sys.argv[1] if len(sys.argv) > 1 else "software_directory.json")
@@ -0,0 +1,30 @@
+import secrets
+
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a throwaway database and instance directory."""
+    app = create_app(
+        {
+            "SECRET_KEY": secrets.token_hex(32),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'catalog.db'}",
+            "RATELIMIT_ENABLED": False,
+            # Tests drive the logo fetcher themselves
+            "LOGO_CACHE_ENABLED": False,
+            "LOG_DIR": str(tmp_path / "logs"),
+        },
+        instance_path=str(tmp_path / "instance"),
+    )
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    # Apps share one logger; drop this app's handler on the temporary log file
+    for handler in list(app.logger.handlers):
+        if getattr(handler, "baseFilename", "").startswith(str(tmp_path)):
+            app.logger.removeHandler(handler)
+            handler.close()
@@ -0,0 +1,223 @@
+"""Logo fetching (app.catalog.logos) against a local HTTP server.
+
+The server listens on 127.0.0.1, which the fetcher rightly refuses, so most
+tests resolve made-up ``.test`` hostnames through a fake resolver and let
+that one address through the internal-address check.
+"""
+
+import hashlib
+import http.server
+import io
+import os
+import socket
+import threading
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.admin import routes as admin_routes
+from app.admin.routes import is_public_url
+from app.catalog import logos
+from app.models import CachedLogo
+
+SERVER_ADDRESS = "127.0.0.1"
+
+
+def _png(width, height):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(out, "PNG")
+    return out.getvalue()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.seen.append((self.path, self.headers["Host"]))
+        status, headers, body = self.server.routes.get(self.path, (404, {}, b""))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Local server; tests fill ``routes`` with path -> (status, headers, body)."""
+    httpd = http.server.ThreadingHTTPServer((SERVER_ADDRESS, 0), _Handler)
+    httpd.routes = {}
+    httpd.seen = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def dns(monkeypatch):
+    """Fake resolver for ``.test`` names.
+
+    Maps a hostname to a list of addresses, handed out one per lookup (the
+    last one repeats), or to None for a name that doesn't resolve. Every
+    lookup is recorded in ``dns.lookups``.
+    """
+    real_getaddrinfo = socket.getaddrinfo
+
+    class Resolver(dict):
+        lookups = []
+
+    resolver = Resolver()
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host not in resolver:
+            return real_getaddrinfo(host, port, *args, **kwargs)
+        resolver.lookups.append(host)
+        answers = resolver[host]
+        if answers is None:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        address = answers.pop(0) if len(answers) > 1 else answers[0]
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (address, port or 0))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    return resolver
+
+
+@pytest.fixture
+def public_server(server, dns, monkeypatch):
+    """The local server, reachable as logos.test and treated as a public address."""
+    is_internal = admin_routes._is_internal
+    monkeypatch.setattr(
+        admin_routes, "_is_internal", lambda addr: str(addr) != SERVER_ADDRESS and is_internal(addr)
+    )
+    dns["logos.test"] = [SERVER_ADDRESS]
+    server.base_url = f"http://logos.test:{server.server_port}"
+    return server
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:{port}/logo.png",
+    "http://localhost:{port}/logo.png",
+    "http://[::1]:{port}/logo.png",
+    "http://10.1.2.3/logo.png",
+    "http://169.254.169.254/latest/meta-data",
+    "http://internal.test:{port}/logo.png",
+    "ftp://logos.test/logo.png",
+])
+def test_rejects_private_and_loopback_hosts(app, server, dns, url):
+    dns["internal.test"] = ["192.168.1.20"]
+    server.routes["/logo.png"] = (200, {"Content-Type": "image/png"}, _png(10, 10))
+
+    with pytest.raises(logos.LogoError, match="not a public"):
+        logos._download(url.format(port=server.server_port))
+    assert server.seen == []
+
+
+def test_host_with_any_internal_address_is_not_public(app, monkeypatch):
+    answers = [
+        (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("93.184.216.34", 0)),
+        (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("10.0.0.7", 0)),
+    ]
+    monkeypatch.setattr(socket, "getaddrinfo", lambda *args, **kwargs: answers)
+    assert not is_public_url("http://mixed.test/logo.png")
+
+
+def test_unresolvable_host_is_not_public(app, dns):
+    dns["nxdomain.test"] = None
+    assert not is_public_url("http://nxdomain.test/logo.png")
+    with pytest.raises(logos.LogoError, match="not a public"):
+        logos._download("http://nxdomain.test/logo.png")
+
+
+def test_connects_to_the_checked_address(app, public_server, dns):
+    # A second lookup would hand out an internal address nothing listens on
+    dns["logos.test"] = [SERVER_ADDRESS, "127.0.0.2"]
+    body = _png(10, 10)
+    public_server.routes["/logo.png"] = (200, {"Content-Type": "image/png"}, body)
+
+    assert logos._download(f"{public_server.base_url}/logo.png") == body
+    assert dns.lookups == ["logos.test"]
+    # Virtual hosts still see the name from the URL
+    assert public_server.seen == [("/logo.png", f"logos.test:{public_server.server_port}")]
+
+
+def test_follows_redirects_to_public_hosts(app, public_server):
+    body = _png(10, 10)
+    public_server.routes["/start"] = (302, {"Location": "/logo.png"}, b"")
+    public_server.routes["/logo.png"] = (200, {"Content-Type": "image/png"}, body)
+
+    assert logos._download(f"{public_server.base_url}/start") == body
+    assert [path for path, _ in public_server.seen] == ["/start", "/logo.png"]
+
+
+def test_rechecks_every_redirect(app, public_server, dns):
+    dns["internal.test"] = ["10.0.0.7"]
+    port = public_server.server_port
+    public_server.routes["/start"] = (
+        302, {"Location": f"http://internal.test:{port}/logo.png"}, b""
+    )
+    public_server.routes["/logo.png"] = (200, {"Content-Type": "image/png"}, _png(10, 10))
+
+    with pytest.raises(logos.LogoError, match="not a public"):
+        logos._download(f"{public_server.base_url}/start")
+    assert [path for path, _ in public_server.seen] == ["/start"]
+
+
+def test_stops_after_too_many_redirects(app, public_server):
+    public_server.routes["/loop"] = (302, {"Location": "/loop"}, b"")
+
+    with pytest.raises(logos.LogoError, match="too many redirects"):
+        logos._download(f"{public_server.base_url}/loop")
+    assert len(public_server.seen) == logos._MAX_REDIRECTS + 1
+
+
+def test_enforces_logo_max_bytes(app, public_server):
+    app.config["LOGO_MAX_BYTES"] = 1000
+    public_server.routes["/big.png"] = (200, {"Content-Type": "image/png"}, b"\0" * 5000)
+    public_server.routes["/small.png"] = (200, {"Content-Type": "image/png"}, b"\0" * 1000)
+
+    with pytest.raises(logos.LogoError, match="larger than 1000 bytes"):
+        logos._download(f"{public_server.base_url}/big.png")
+    assert len(logos._download(f"{public_server.base_url}/small.png")) == 1000
+
+
+def _fetch(url):
+    db.session.add(CachedLogo(url=url))
+    db.session.commit()
+    counts = logos.fetch_pending()
+    return counts, CachedLogo.query.filter_by(url=url).one()
+
+
+def test_rejects_images_over_the_pixel_limit(app, public_server, monkeypatch):
+    monkeypatch.setattr(logos, "_MAX_PIXELS", 30 * 30)
+    public_server.routes["/huge.png"] = (200, {"Content-Type": "image/png"}, _png(40, 40))
+
+    counts, logo = _fetch(f"{public_server.base_url}/huge.png")
+    assert counts == (0, 1)
+    assert logo.status == "failed"
+    assert "40x40" in logo.error
+    assert not os.path.exists(logos.logo_dir()) or os.listdir(logos.logo_dir()) == []
+
+
+def test_reencodes_logos_as_webp_thumbnails(app, public_server):
+    app.config["LOGO_THUMBNAIL_SIZE"] = 160
+    body = _png(400, 200)
+    public_server.routes["/logo.png"] = (200, {"Content-Type": "image/png"}, body)
+
+    counts, logo = _fetch(f"{public_server.base_url}/logo.png")
+    assert counts == (1, 0)
+    assert logo.status == "ready"
+    assert logo.original == hashlib.sha256(body).hexdigest()
+
+    path = os.path.join(logos.logo_dir(), f"{logo.thumbnail}.webp")
+    with open(path, "rb") as f:
+        thumbnail = f.read()
+    assert logo.thumbnail == hashlib.sha256(thumbnail).hexdigest()
+    with Image.open(io.BytesIO(thumbnail)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (160, 80)